@@ -0,0 +1,295 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import fetcher
+from storage import append_jsonl, atomic_write, read_jsonl
+
+ASSET_DIR = 'assets'
+INDEX_NAME = 'index.jsonl'
+MAX_ASSET_BYTES = 20 * 1024 * 1024  # 单个资源的大小上限
+CHUNK_SIZE = 64 * 1024
+
+# {% image URL ... %}、{% video URL %} 中的资源地址（youtube:ID 之类不是 URL，不下载）；
+# URL 中可能有 %20 之类的百分号编码，只在空白或标签结尾 %} 处结束
+TAG_ASSET_RE = re.compile(r'(\{%\s*(image|video)\s+)(https?://\S+?)(?=\s|%\})')
+# 元信息中的封面图
+COVER_RE = re.compile(r'^((banner|cover):[ \t]*)(https?://\S+)[ \t]*$', re.M)
+
+
+class AssetTooLarge(Exception):
+    """资源超过大小上限。"""
+
+
+def manifest_path(markdown_path):
+    """文章对应的资源清单路径，如 foo.md -> foo.assets.json。"""
+    return os.path.splitext(markdown_path)[0] + '.assets.json'
+
+
+def extract_assets(markdown):
+    """
+    列出文章中引用的图片与视频。
+
+    参数:
+    markdown (str): 转换后的 Markdown。
+
+    返回:
+    list: [{'url', 'type', 'tags'}]，按首次出现的顺序，同一 URL 只出现一次；
+          tags 为引用它的位置（image、video、banner、cover）。
+    """
+    assets = {}
+    found = [(m.start(), m.group(2), m.group(3)) for m in COVER_RE.finditer(markdown)]
+    found += [(m.start(), m.group(2), m.group(3)) for m in TAG_ASSET_RE.finditer(markdown)]
+    for _, tag, url in sorted(found):
+        entry = assets.setdefault(url, {'url': url, 'type': 'video' if tag == 'video' else 'image', 'tags': []})
+        if tag not in entry['tags']:
+            entry['tags'].append(tag)
+    return list(assets.values())
+
+
+def write_manifest(markdown_path, markdown, article_url=None):
+    """在文章旁写入资源清单，返回资源数。"""
+    assets = extract_assets(markdown)
+    with open(manifest_path(markdown_path), 'w', encoding='utf-8') as f:
+        json.dump({'article': article_url, 'file': os.path.basename(markdown_path), 'assets': assets},
+                  f, ensure_ascii=False, indent=2)
+    return len(assets)
+
+
+def load_manifest(markdown_path):
+    """读取文章的资源清单；没有清单时直接从 Markdown 中提取。"""
+    path = manifest_path(markdown_path)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)['assets']
+    with open(markdown_path, encoding='utf-8') as f:
+        return extract_assets(f.read())
+
+
+def rewrite_tags(markdown, local_paths):
+    """把标签与封面中的资源 URL 替换为本地路径，local_paths 中没有的 URL 保持不变。"""
+    def replace(match):
+        return match.group(1) + local_paths.get(match.group(3), match.group(3))
+    return COVER_RE.sub(replace, TAG_ASSET_RE.sub(replace, markdown))
+
+
+class AssetStore:
+    """
+    按内容哈希去重的本地资源目录。
+
+    每个资源保存为 <SHA-256 前 16 位><扩展名>，不同 URL 的相同内容只保存一份；
+    index.jsonl 记录 URL 到文件的映射（追加写入，同一 URL 以最后一条为准）。
+    下载中断时 .part 文件保留在目录中，旁边的 .if-range 文件记录响应的 ETag（或 Last-Modified），
+    下次用 Range 与 If-Range 请求从断点继续；资源在此期间有变化时服务器返回完整内容，从头下载。
+    """
+
+    def __init__(self, directory=ASSET_DIR, session=None, max_bytes=MAX_ASSET_BYTES, timeout=fetcher.TIMEOUT,
+                 per_host=fetcher.PER_HOST_LIMIT):
+        self.directory = directory
+        self.session = session or fetcher.create_session()
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.limiter = fetcher.HostLimiter(per_host)
+        self.index = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        for record in read_jsonl(self.index_path):
+            self.index[record['url']] = record
+
+    def get(self, url):
+        """已下载且文件仍然存在的记录，否则返回 None。"""
+        record = self.index.get(url)
+        if record and os.path.exists(os.path.join(self.directory, record['file'])):
+            return record
+        return None
+
+    def _record(self, record):
+        with self._lock:
+            self.index[record['url']] = record
+            append_jsonl(self.index_path, record)
+
+    def download(self, url):
+        """
+        下载单个资源（已下载时直接返回记录），返回 {'url', 'file', 'sha256', 'size', 'reused'}。
+
+        超过大小上限时抛出 AssetTooLarge，并删除已下载的部分。
+        """
+        record = self.get(url)
+        if record:
+            return dict(record, reused=True)
+
+        part = os.path.join(self.directory, '.part-' + hashlib.sha1(url.encode('utf-8')).hexdigest()[:16])
+        validator = self._read_validator(part)
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {}
+        if offset and validator:
+            headers = {'Range': f'bytes={offset}-', 'If-Range': validator}
+        else:
+            offset = 0  # 没有记录 ETag/Last-Modified 时无法确认 .part 仍是同一版本，从头下载
+        with self.limiter(url):
+            response = self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+            try:
+                if response.status_code == 416:
+                    # .part 已是完整内容（或已失效），释放主机并发名额后去掉 Range 重新下载
+                    self._discard(part)
+                    content_type = None
+                else:
+                    content_type = self._save(url, response, part, offset)
+            finally:
+                response.close()
+        if content_type is None:
+            return self.download(url)
+        return self._store(url, part, content_type)
+
+    def _save(self, url, response, part, offset):
+        """把响应写入 .part 文件（offset 大于 0 且服务器返回 206 时追加），返回 Content-Type。"""
+        try:
+            response.raise_for_status()
+            if response.status_code != 206:
+                offset = 0  # 服务器不支持断点续传，从头下载
+            length = response.headers.get('Content-Length')
+            if self.max_bytes and length and offset + int(length) > self.max_bytes:
+                raise AssetTooLarge(f"{url} 大小 {offset + int(length)} 字节，超过上限 {self.max_bytes} 字节")
+            self._write_validator(part, response.headers)
+            size = offset
+            with open(part, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if self.max_bytes and size > self.max_bytes:
+                        raise AssetTooLarge(f"{url} 超过大小上限 {self.max_bytes} 字节")
+                    f.write(chunk)
+        except AssetTooLarge:
+            self._discard(part)
+            raise
+        return response.headers.get('Content-Type', '').split(';')[0].strip()
+
+    @staticmethod
+    def _read_validator(part):
+        try:
+            with open(part + '.if-range', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    @staticmethod
+    def _write_validator(part, headers):
+        """记录 If-Range 可用的 ETag（弱 ETag 不能用于 If-Range）或 Last-Modified，都没有时删除旧记录。"""
+        etag = headers.get('ETag', '')
+        validator = etag if etag and not etag.startswith('W/') else headers.get('Last-Modified')
+        if validator:
+            with open(part + '.if-range', 'w', encoding='utf-8') as f:
+                f.write(validator)
+        elif os.path.exists(part + '.if-range'):
+            os.unlink(part + '.if-range')
+
+    @staticmethod
+    def _discard(part):
+        for path in (part, part + '.if-range'):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def _store(self, url, part, content_type):
+        """计算 .part 文件的内容哈希，移入资源目录（相同内容已存在时丢弃）并记入索引。"""
+        size = os.path.getsize(part)
+        digest = hashlib.sha256()
+        with open(part, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        ext = os.path.splitext(urlparse(url).path)[1].lower() or mimetypes.guess_extension(content_type) or ''
+        filename = digest[:16] + ext
+        target = os.path.join(self.directory, filename)
+        reused = os.path.exists(target)
+        if reused:
+            os.unlink(part)  # 相同内容已由其他 URL 下载过
+        else:
+            os.replace(part, target)
+        self._discard(part)  # 删除 .if-range
+        record = {'url': url, 'file': filename, 'sha256': digest, 'size': size}
+        self._record(record)
+        return dict(record, reused=reused)
+
+
+def download_assets(markdown_paths, store, workers=fetcher.MAX_WORKERS, rewrite=False, log=print):
+    """
+    并行下载多篇文章引用的资源，所有文章中相同的 URL 只下载一次。
+
+    参数:
+    markdown_paths (list): Markdown 文件路径（有 .assets.json 清单时使用清单）。
+    store (AssetStore): 本地资源目录。
+    workers (int): 并发下载数。
+    rewrite (bool): 下载后把文章中的资源 URL 替换为相对于文章的本地路径。
+
+    返回:
+    tuple: (下载的字节数, 复用的资源数, [(URL, 错误)])。
+    """
+    articles = {path: load_manifest(path) for path in markdown_paths}
+    urls = list(dict.fromkeys(asset['url'] for assets in articles.values() for asset in assets))
+    results = {}
+    errors = []
+    downloaded = reused = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {url: executor.submit(store.download, url) for url in urls}
+        for url, future in futures.items():
+            try:
+                record = future.result()
+            except Exception as e:
+                errors.append((url, e))
+                log(f"下载失败: {url}: {e}")
+                continue
+            results[url] = record
+            if record['reused']:
+                reused += 1
+            else:
+                downloaded += record['size']
+                log(f"已下载: {url} -> {record['file']} ({record['size']} 字节)")
+
+    if rewrite:
+        for path, assets in articles.items():
+            base = os.path.dirname(os.path.abspath(path))
+            local_paths = {asset['url']: os.path.relpath(os.path.join(store.directory, results[asset['url']]['file']), base)
+                           for asset in assets if asset['url'] in results}
+            if not local_paths:
+                continue
+            with open(path, encoding='utf-8') as f:
+                markdown = f.read()
+            rewritten = rewrite_tags(markdown, local_paths)
+            if rewritten != markdown:
+                atomic_write(path, rewritten)
+                log(f"已替换为本地路径: {path}")
+    return downloaded, reused, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='下载文章引用的图片与视频，并可将标签替换为本地路径')
+    parser.add_argument('files', nargs='+', help='Markdown 文件（优先读取同名的 .assets.json 清单）')
+    parser.add_argument('-d', '--dest', default=ASSET_DIR, help=f'资源保存目录 (默认: {ASSET_DIR})')
+    parser.add_argument('--workers', type=int, default=fetcher.MAX_WORKERS, help='并发下载数')
+    parser.add_argument('--per-host', type=int, default=fetcher.PER_HOST_LIMIT, help='单个主机的最大并发数')
+    parser.add_argument('--max-size', type=float, default=MAX_ASSET_BYTES / 1024 / 1024,
+                        help='单个资源的大小上限（MB），0 表示不限')
+    parser.add_argument('--rewrite', action='store_true', help='把文章中的资源 URL 替换为本地路径')
+    args = parser.parse_args()
+
+    store = AssetStore(args.dest, fetcher.create_session(pool_size=args.workers),
+                       max_bytes=int(args.max_size * 1024 * 1024), per_host=args.per_host)
+    downloaded, reused, errors = download_assets(args.files, store, args.workers, args.rewrite)
+    print(f"下载 {downloaded / 1024 / 1024:.1f} MB，复用 {reused} 个已有资源")
+    if errors:
+        print(f"\n共 {len(errors)} 个资源下载失败：")
+        for url, e in errors:
+            print(f"  {url}\n    {e.__class__.__name__}: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
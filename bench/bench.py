@@ -0,0 +1,203 @@
+"""
+convert / format_fix 离线基准测试与黄金样本比对。
+
+用法（在仓库根目录运行）:
+    python bench/bench.py                  # 计时并与 bench/golden 比对
+    python bench/bench.py -n 20            # 每篇文章重复 20 次
+    python bench/bench.py --update-golden  # 有意修改转换结果后，重新生成黄金样本
+
+全程只读取 bench/corpus 中手写的合成页面与 bench/feeds 中的订阅源样本，不访问网络。
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import difflib
+import argparse
+import tempfile
+import tracemalloc
+from collections import defaultdict
+from datetime import date
+from contextlib import contextmanager
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+import convert
+import discover
+import format_fix
+
+CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus')
+GOLDEN_DIR = os.path.join(BENCH_DIR, 'golden')
+FEEDS_DIR = os.path.join(BENCH_DIR, 'feeds')
+DISCOVERY_SINCE = date(2025, 1, 1)  # 订阅源样本中该日期之后的文章恰好是语料中的页面
+GITHUB_ID = 'bench'
+
+
+class StageTimer:
+    """按阶段名累计耗时，可直接作为 convert.process_article 的 timer 参数。"""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] += time.perf_counter() - start
+
+
+def load_corpus(corpus_dir):
+    """读取语料，返回 [(名称, 页面 URL, HTML)]，URL 取自 og:url。"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('meta'))
+        url = soup.find('meta', property='og:url')['content']
+        pages.append((os.path.basename(path), url, html))
+    return pages
+
+
+def convert_once(url, html, parser, timer):
+    """转换一篇文章并运行 format_fix，返回 (文件名, 转换结果, 格式化结果)。"""
+    rule_index = convert.timed_rule_index(timer)
+    filename = convert.convert_page(url, html, GITHUB_ID, parser, timer=timer, rule_index=rule_index)
+    with open(filename, encoding='utf-8') as f:
+        converted = f.read()
+    with timer('format_fix'):
+        formatted = format_fix.format_text(converted)
+    return filename, converted, formatted
+
+
+def golden_paths(filename):
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(GOLDEN_DIR, filename), os.path.join(GOLDEN_DIR, stem + '.formatted.md')
+
+
+def compare_golden(filename, outputs, update):
+    """与黄金样本比对，返回不一致的描述列表；update 为 True 时改为写入黄金样本。"""
+    problems = []
+    for path, actual in zip(golden_paths(filename), outputs):
+        if update:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(actual)
+            continue
+        if not os.path.exists(path):
+            problems.append(f"缺少黄金样本: {os.path.relpath(path)}")
+            continue
+        with open(path, encoding='utf-8', newline='') as f:
+            expected = f.read()
+        if actual != expected:
+            diff = difflib.unified_diff(expected.splitlines(keepends=True), actual.splitlines(keepends=True),
+                                        os.path.relpath(path), '实际输出', n=1)
+            problems.append(''.join(list(diff)[:40]))
+    return problems
+
+
+def check_discovery(feeds_dir, pages):
+    """
+    用 bench/feeds 中的 RSS 与站点地图索引样本运行发现阶段，
+    发现的 URL 应恰好是语料中的页面（更早的文章与过期的子站点地图被过滤）。
+    """
+    feeds = sorted(glob.glob(os.path.join(feeds_dir, '*-rss.xml'))) + \
+        sorted(glob.glob(os.path.join(feeds_dir, '*-sitemap.xml')))
+
+    def offline(url):
+        raise OSError(f"基准测试不访问网络: {url}")
+
+    problems = []
+    start = time.perf_counter()
+    found = list(discover.discover(feeds, offline, since=DISCOVERY_SINCE, log=problems.append))
+    elapsed = time.perf_counter() - start
+    expected = sorted(url for _, url, _ in pages)
+    if sorted(found) != expected:
+        problems.append(f"订阅源发现的 URL 与语料不一致:\n  发现: {sorted(found)}\n  预期: {expected}")
+    print(f"订阅源发现: {len(feeds)} 个订阅源，{len(found)} 个 URL，耗时 {elapsed * 1000:.1f} 毫秒")
+    return problems
+
+
+def measure_peak_memory(pages, parser):
+    """单独跑一遍并用 tracemalloc 统计每篇文章的峰值内存（字节）。"""
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for name, url, html in pages:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            convert_once(url, html, parser, StageTimer())
+            peaks[name] = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def print_report(timer, wall, runs, peaks):
+    total = sum(v for k, v in timer.totals.items() if ':' not in k)
+    print(f"\n{'阶段':<34}{'总耗时(ms)':>12}{'每篇(ms)':>12}{'占比':>8}")
+    for name, seconds in sorted(timer.totals.items(), key=lambda item: item[0].replace(':', ' ')):
+        label = ('  ' + name.split(':', 1)[1]) if ':' in name else name
+        share = f"{seconds / total:.1%}" if total else '-'
+        print(f"{label:<34}{seconds * 1000:>12.1f}{seconds * 1000 / runs:>12.2f}{share:>8}")
+    print(f"\n共 {runs} 次转换，耗时 {wall:.2f} 秒，{runs / wall:.1f} 篇/秒")
+    for name, peak in peaks.items():
+        print(f"峰值内存 {name}: {peak / 1024 / 1024:.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='convert / format_fix 离线基准测试')
+    parser.add_argument('-n', '--iterations', type=int, default=5, help='每篇文章的重复次数')
+    parser.add_argument('--parser', default=convert.PARSER, choices=convert.PARSERS, help='HTML 解析后端')
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='语料目录')
+    parser.add_argument('--feeds', default=FEEDS_DIR, help='订阅源样本目录')
+    parser.add_argument('--update-golden', action='store_true', help='用当前输出覆盖黄金样本')
+    parser.add_argument('--no-memory', action='store_true', help='跳过峰值内存统计')
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        parser.error(f"语料目录中没有 HTML 文件: {args.corpus}")
+
+    workdir = tempfile.mkdtemp(prefix='convert-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        problems = []
+        for name, url, html in pages:
+            filename, converted, formatted = convert_once(url, html, args.parser, StageTimer())
+            problems += compare_golden(filename, (converted, formatted), args.update_golden)
+
+        timer = StageTimer()
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            for name, url, html in pages:
+                convert_once(url, html, args.parser, timer)
+        wall = time.perf_counter() - start
+
+        peaks = {} if args.no_memory else measure_peak_memory(pages, args.parser)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(timer, wall, args.iterations * len(pages), peaks)
+    if os.path.isdir(args.feeds):
+        problems += check_discovery(args.feeds, pages)
+
+    if args.update_golden:
+        print(f"\n已更新 {len(pages)} 篇文章的黄金样本")
+    elif problems:
+        print("\n输出与黄金样本不一致:")
+        for problem in problems:
+            print(problem)
+        sys.exit(1)
+    else:
+        print(f"\n{len(pages)} 篇文章的输出与黄金样本一致")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
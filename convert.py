@@ -1,16 +1,49 @@
 import re
 import os
-import requests
+import json
+import zlib
+import hashlib
+import time
+import argparse
 import traceback
-from bs4 import BeautifulSoup
+from itertools import islice
+from collections import deque
+from contextlib import nullcontext
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 import html2text
 from datetime import datetime
 from urllib.parse import urlparse
 from slugify import slugify
 
-headers = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-}
+import assets
+import discover
+import fetcher
+import format_fix
+import http_cache
+import metrics
+from manifest import Manifest, MANIFEST_PATH, is_unchanged
+
+headers = fetcher.DEFAULT_HEADERS
+
+# HTML 解析后端。'html.parser' 为参考实现；'lxml' 速度更快，但树结构可能略有差异
+PARSER = 'html.parser'
+PARSERS = ('html.parser', 'lxml', 'html5lib')
+
+# 转换器版本：修改转换规则或输出格式后递增，清单中旧版本生成的文件会被重新转换
+CONVERTER_VERSION = '2'
+
+# Markdown 模板，字段写作 {{name}}
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'template.md')
+
+# 预编译的正则表达式
+TEMPLATE_FIELD_RE = re.compile(r'\{\{(\w+)\}\}')
+REF_PARAM_RE = re.compile(r'\?ref=(itsfoss\.com|news\.itsfoss\.com)')
+ESCAPED_LINK_RE = re.compile(r'\\\[(.*?)\\\]\((.*?)\)')
+P_TAG_RE = re.compile(r'</?p[^>]*>')
+WHITESPACE_RE = re.compile(r'\s{2,}')
+YAML_SPECIAL_RE = re.compile(r'[:#\[\]{},&*!|>\'"%@`]|^[-?]')
 
 def extract_youtube_id(url):
     """提取YouTube视频ID"""
@@ -40,8 +73,8 @@ def process_figcaption(figcaption):
             del tag.attrs['style']
 
     description = str(figcaption.p).replace('\n', ' ') if figcaption.p else ''
-    description = re.sub(r'</?p[^>]*>', '', description)
-    description = re.sub(r'\s{2,}', ' ', description).strip()
+    description = P_TAG_RE.sub('', description)
+    description = WHITESPACE_RE.sub(' ', description).strip()
     return description.replace("'", "\\'")
 
 def process_image(figure):
@@ -78,7 +111,118 @@ def process_callout(div):
     text = html2text.html2text(str(text_div)).strip() if text_div else ''
     return f"{{% note {emoji} '{text}' color:{color} %}}"
 
-def process_article(article):
+def process_video(figure):
+    """处理 Ghost 视频卡片，没有可用视频时返回 None 交给后续规则。"""
+    video_container = figure.find('div', class_='kg-video-container')
+    if not video_container:
+        return None
+
+    video_tag = video_container.find('video')
+    if video_tag and video_tag.has_attr('src'):
+        src = video_tag['src'].split('?')[0]
+        return f'{{% video {src} %}}'
+    return None
+
+def process_youtube(figure):
+    """处理嵌入的 YouTube 视频，其他嵌入返回 None 交给后续规则。"""
+    iframe = figure.find('iframe')
+    if iframe and 'youtube.com' in iframe.get('src', ''):
+        video_id = extract_youtube_id(iframe['src'])
+        if video_id:
+            return f'{{% video youtube:{video_id} %}}'
+    return None
+
+def process_link(a_tag):
+    """去除站内跟踪参数，原地修改，不替换节点。"""
+    if a_tag.has_attr('href'):
+        a_tag['href'] = REF_PARAM_RE.sub('', a_tag['href'])
+    return None
+
+def process_code(code_tag):
+    code_content = code_tag.get_text(strip=False).strip()
+    return f'```\n{code_content}\n```'
+
+# 转换规则表：(标签名, 必需的 class, 处理函数, 时机)
+# 处理函数返回字符串时用其替换节点，返回 None 时继续匹配同一标签的下一条规则。
+# 'enter' 规则在进入节点时执行，替换后不再遍历其子树；
+# 'exit' 规则在子树处理完毕后执行，因此按钮和备注块看到的是已处理过链接和代码的内容。
+TRANSFORM_RULES = [
+    ('figure', 'kg-video-card', process_video, 'enter'),
+    ('figure', 'kg-embed-card', process_youtube, 'enter'),
+    ('figure', None, process_image, 'enter'),
+    ('a', None, process_link, 'enter'),
+    ('code', None, process_code, 'enter'),
+    ('div', 'kg-button-card', process_button, 'exit'),
+    ('div', 'kg-callout-card', process_callout, 'exit'),
+]
+
+def build_rule_index(rules):
+    """将规则表按 (时机, 标签名) 分组，便于遍历时 O(1) 查找。"""
+    index = {'enter': {}, 'exit': {}}
+    for tag_name, class_name, handler, phase in rules:
+        index[phase].setdefault(tag_name, []).append((class_name, handler))
+    return index
+
+RULE_INDEX = build_rule_index(TRANSFORM_RULES)
+
+def _apply_rules(node, candidates):
+    classes = node.get('class') or ()
+    for class_name, handler in candidates:
+        if class_name is None or class_name in classes:
+            result = handler(node)
+            if result is not None:
+                node.replace_with(result)
+                return True
+    return False
+
+def transform_tree(root, rule_index=RULE_INDEX):
+    """
+    单次深度优先遍历 root 子树，按标签名与 class 分派转换规则。
+
+    参数:
+    root (Tag): 要原地转换的节点（包括其自身）。
+    rule_index (dict): build_rule_index 生成的规则索引。
+    """
+    enter_rules = rule_index['enter']
+    exit_rules = rule_index['exit']
+    stack = [(root, False)]
+    while stack:
+        node, exiting = stack.pop()
+        if exiting:
+            _apply_rules(node, exit_rules[node.name])
+            continue
+        if not isinstance(node, Tag):
+            continue
+        candidates = enter_rules.get(node.name)
+        if candidates and _apply_rules(node, candidates):
+            continue
+        if node.name in exit_rules:
+            stack.append((node, True))
+        stack.extend((child, False) for child in reversed(node.contents))
+
+def _null_stage(name):
+    return nullcontext()
+
+def timed_rule_index(timer):
+    """包装每条转换规则的处理函数，使其耗时计入 'transform:<函数名>' 阶段。"""
+    def wrap(handler):
+        def timed(node):
+            with timer(f'transform:{handler.__name__}'):
+                return handler(node)
+        return timed
+    rules = [(tag, cls, wrap(handler), phase) for tag, cls, handler, phase in TRANSFORM_RULES]
+    return build_rule_index(rules)
+
+def process_article(article, timer=None, rule_index=RULE_INDEX):
+    """
+    将文章节点转换为 Markdown。会原地修改传入的节点。
+
+    参数:
+    article (Tag): 文章节点。
+    timer (callable): 可选，timer(阶段名) 返回用于计时的上下文管理器。
+    rule_index (dict): 转换规则索引。
+    """
+    stage = timer or _null_stage
     h = html2text.HTML2Text()
     h.body_width = 0
     h.ignore_links = True
@@ -86,153 +230,396 @@ def process_article(article):
     h.ul_item_mark = '*'
     h.emphasis_mark = '_'
 
-    article_html = str(article)
-    soup = BeautifulSoup(article_html, 'html.parser')
+    with stage('transform'):
+        # 移除第一个<a>标签
+        first_a = article.find('a')
+        if first_a:
+            first_a.decompose()
 
-    # 移除第一个<a>标签
-    first_a = soup.find('a')
-    if first_a:
-        first_a.decompose()
+        # 视频、图片、链接、代码、按钮、备注块在一次遍历中完成
+        transform_tree(article, rule_index)
 
-    # 处理所有视频容器（新增逻辑）
-    for figure in soup.find_all('figure', class_='kg-video-card'):
-        video_container = figure.find('div', class_='kg-video-container')
-        if not video_container:
-            continue
+    with stage('serialize'):
+        modified_html = str(article)
+        modified_html = modified_html.replace('href="/', 'href="https://itsfoss.com/')
 
-        video_tag = video_container.find('video')
-        if video_tag and video_tag.has_attr('src'):
-            src = video_tag['src'].split('?')[0]
-            figure.replace_with(f'{{% video {src} %}}')
-
-    # 处理YouTube视频（保持原有逻辑）
-    for figure in soup.find_all('figure', class_='kg-embed-card'):
-        iframe = figure.find('iframe')
-        if iframe and 'youtube.com' in iframe.get('src', ''):
-            src = iframe['src']
-            video_id = extract_youtube_id(src)
-            if video_id:
-                figure.replace_with(f'{{% video youtube:{video_id} %}}')
-
-    # 处理图片
-    for figure in soup.find_all('figure'):
-        img_md = process_image(figure)
-        figure.replace_with(img_md)
-
-    # 处理链接
-    for a_tag in soup.find_all('a', href=True):
-        a_tag['href'] = re.sub(r'\?ref=(itsfoss\.com|news\.itsfoss\.com)', '', a_tag['href'])
-
-    # 处理代码块
-    for code_tag in soup.find_all('code'):
-        code_content = code_tag.get_text(strip=False).strip()
-        code_tag.replace_with(f'```\n{code_content}\n```')
-
-    # 处理按钮
-    for div in soup.find_all('div', class_='kg-button-card'):
-        button_md = process_button(div)
-        div.replace_with(button_md)
-
-    # 处理备注块
-    for div in soup.find_all('div', class_='kg-callout-card'):
-        callout_md = process_callout(div)
-        div.replace_with(callout_md)
-
-    modified_html = str(soup)
-    modified_html = modified_html.replace('href="/', 'href="https://itsfoss.com/')
-
-    md_content = h.handle(modified_html).strip()
-    md_content = re.sub(r'\\\[(.*?)\\\]\((.*?)\)', r'[\1](\2)', md_content)
-    return md_content
+    with stage('html2text'):
+        md_content = h.handle(modified_html).strip()
 
-def main():
-    github_id = input("请输入GitHub ID: ")
+    with stage('postprocess'):
+        md_content = ESCAPED_LINK_RE.sub(r'[\1](\2)', md_content)
+    return md_content
 
-    with open('urls.txt') as f:
-        urls = [line.strip() for line in f if line.strip()]
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+def options_fingerprint(github_id, parser, template=TEMPLATE_PATH, tidy=False):
+    """
+    影响输出内容的转换选项的指纹，记入转换清单；选项变化后已转换的 URL 会重新转换。
+
+    模板按文件内容计入，换用其他模板或修改模板文件都会使指纹变化。
+    """
+    with open(template, 'rb') as f:
+        template_hash = hashlib.sha256(f.read()).hexdigest()
+    options = {'github_id': github_id, 'parser': parser, 'template': template_hash, 'tidy': tidy}
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def read_modified_time(html):
+    """只解析 <meta> 标签，快速读取 article:modified_time。"""
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('meta'))
+    meta = soup.find('meta', property='article:modified_time')
+    return meta['content'] if meta and meta.has_attr('content') else None
+
+def extract_metadata(soup, url):
+    """从页面中提取标题、作者、分类、摘要等元数据，并生成文件名。"""
+    # 元数据提取
+    og_title = soup.find('meta', property='og:title')['content']
+    publish_time = soup.find('meta', property='article:modified_time')['content']
+    date_str = datetime.fromisoformat(publish_time[:-1]).strftime('%Y%m%d')
+    og_description = soup.find('meta', property='og:description')
+    summary = og_description['content'].strip() if og_description else ''
+
+    # 生成文件名
+    safe_title = sanitize_filename(og_title)
+    filename = f"{date_str}-{safe_title}.md"
+
+    # 标题提取
+    title = soup.find('h1', class_='post-hero__title').get_text(strip=True)
+
+    # 作者信息
+    author_span = soup.find('span', class_=lambda c: c and c.startswith('post-info__author'))
+    author_link_tag = author_span.find('a') if author_span else None
+    author = "Unknown"
+    author_link = "#"
+
+    if author_span and author_link_tag:
+        href = author_link_tag.get('href', '')
+        if 'post-info__author' in author_span['class']:
+            base_url = 'https://itsfoss.com'
+        else:
+            base_url = 'https://news.itsfoss.com'
+        author_link = f"{base_url}{href}"
+        author = author_link_tag.get_text(strip=True)
+
+    # 分类判断
+    domain = urlparse(url).netloc
+    category = '新闻' if 'news.' in domain else '技术'
+
+    # 标签与封面图
+    tags = [tag['content'].strip() for tag in soup.find_all('meta', property='article:tag') if tag.get('content')]
+    og_image = soup.find('meta', property='og:image')
+    cover_image = og_image['content'].strip() if og_image and og_image.get('content') else None
+
+    return {
+        'filename': filename,
+        'title': title,
+        'author': author,
+        'author_link': author_link,
+        'category': category,
+        'summary': summary,
+        'url': url,
+        'tags': list(dict.fromkeys(tags)),
+        'cover_image': cover_image,
+        'abbrlink': make_abbrlink(url),
+        'modified_time': publish_time,
+    }
+
+def make_abbrlink(url):
+    """由原文 URL 生成固定的永久链接（CRC32，8 位十六进制），与 hexo-abbrlink 的 crc32/hex 格式一致。"""
+    return f"{zlib.crc32(url.encode('utf-8')):08x}"
+
+def yaml_list(items, indent='  '):
+    """把字符串列表渲染为 YAML 块序列（以换行开头，接在 `key:` 之后），必要时加引号。"""
+    lines = []
+    for item in items:
+        if YAML_SPECIAL_RE.search(item) or item != item.strip():
+            item = json.dumps(item, ensure_ascii=False)
+        lines.append(f"\n{indent}- {item}")
+    return ''.join(lines)
+
+class Template:
+    """
+    预编译的 Markdown 模板。
+
+    模板中的 {{name}} 为字段，加载时切分一次，渲染时只需填入字段并拼接。
+    未提供（值为 None）的字段原样保留，留给译者与校对填写。
+    """
+
+    def __init__(self, text):
+        # 偶数下标为原文片段，奇数下标为字段名
+        self.parts = TEMPLATE_FIELD_RE.split(text)
+
+    def render(self, values):
+        parts = self.parts[:]
+        for i in range(1, len(parts), 2):
+            value = values.get(parts[i])
+            parts[i] = f"{{{{{parts[i]}}}}}" if value is None else str(value)
+        return ''.join(parts)
+
+@lru_cache(maxsize=None)
+def load_template(path=TEMPLATE_PATH):
+    """读取并编译模板，每个进程对同一路径只加载一次。"""
+    with open(path, encoding='utf-8') as f:
+        return Template(f.read())
+
+def render_article(meta, content, github_id, template=TEMPLATE_PATH):
+    """用模板生成完整的 Markdown 文件内容。"""
+    return load_template(template).render({
+        'title': meta['title'],
+        'abbrlink': meta['abbrlink'],
+        'cover_image': meta['cover_image'],
+        'category': meta['category'],
+        'tags': yaml_list(meta['tags']) if meta['tags'] else None,
+        'via': meta['url'],
+        'author': meta['author'],
+        'author_link': meta['author_link'],
+        'selector': github_id,
+        'summary': meta['summary'],
+        'content': content,
+    })
+
+def render_page(url, html, github_id, parser=PARSER, timer=None, rule_index=RULE_INDEX, template=TEMPLATE_PATH):
+    """
+    解析页面 HTML 并生成 Markdown，不写文件。
+
+    返回:
+    tuple: (元数据, Markdown 内容)，元数据见 extract_metadata。timer 与 rule_index 见 process_article，template 为模板路径。
+    """
+    stage = timer or _null_stage
+    with stage('parse'):
+        soup = BeautifulSoup(html, parser)
+
+    with stage('metadata'):
+        meta = extract_metadata(soup, url)
+
+    # 正文处理
+    article = soup.find('article', class_='post')
+    content = process_article(article, timer, rule_index)
+
+    with stage('render'):
+        markdown = render_article(meta, content, github_id, template)
+    return meta, markdown
+
+def convert_page(url, html, github_id, parser=PARSER, timer=None, rule_index=RULE_INDEX, template=TEMPLATE_PATH):
+    """解析页面 HTML，生成 Markdown 文件并返回文件名。"""
+    meta, markdown = render_page(url, html, github_id, parser, timer, rule_index, template)
+    with (timer or _null_stage)('write'):
+        with open(meta['filename'], 'w', encoding='utf-8') as f:
+            f.write(markdown)
+    return meta['filename']
+
+def convert_job(url, body, github_id, parser=PARSER, record=None, tidy=False, template=TEMPLATE_PATH, timer=None,
+                timed=False):
+    """
+    转换单个页面，不写文件，可在子进程中运行。
+
+    参数:
+    url (str): 页面 URL。
+    body (bytes): 原始 HTML 字节。
+    github_id (str): 选题人的 GitHub ID。
+    parser (str): HTML 解析后端。
+    record (dict): 清单中该 URL 的有效记录（输出文件仍存在且转换器版本一致），没有时为 None。
+    tidy (bool): 是否在内存中用 format_fix 整理生成的 Markdown。
+    template (str): 模板路径，每个子进程只加载一次。
+    timer (callable): 可选，各阶段（含每条转换规则）的计时器，见 process_article。
+    timed (bool): 在子进程中运行时使用，为 True 时在本地计时，各阶段耗时通过结果的 timings 传回。
+
+    返回:
+    dict: status 为 'skipped'（页面未变化）或 'converted'，
+          以及 filename、markdown、content_hash、modified_time、seconds（转换耗时）。
+    """
+    start = time.perf_counter()
+    local = metrics.Metrics() if timed else None
+    timer = timer or local
+    html = body.decode('utf-8', errors='replace')
+    page_hash = content_hash(body)
+    result = {'url': url, 'content_hash': page_hash}
+    # 只有清单中有记录且正文哈希不同时才需要单独读取 modified_time；需要转换时直接取自完整解析的元数据
+    if record and (record.get('content_hash') == page_hash
+                   or is_unchanged(record, page_hash, read_modified_time(html))):
+        result = dict(result, status='skipped', filename=record['filename'], markdown=None,
+                      modified_time=record.get('modified_time'))
+    else:
+        rule_index = timed_rule_index(timer) if timer else RULE_INDEX
+        meta, markdown = render_page(url, html, github_id, parser, timer, rule_index, template)
+        if tidy:
+            with (timer or _null_stage)('format'):
+                markdown = format_fix.format_text(markdown)
+        result = dict(result, status='converted', filename=meta['filename'], markdown=markdown,
+                      modified_time=meta['modified_time'])
+    result['seconds'] = time.perf_counter() - start
+    if local:
+        result['timings'] = local.snapshot()
+    return result
+
+def convert_all(pages, github_id, parser, records, jobs=1, tidy=False, template=TEMPLATE_PATH, metrics=None):
+    """
+    按输入顺序产出每个页面的转换结果 (url, result, error)。
+
+    参数:
+    pages (iterable): 产出 (url, body, error) 的迭代器，通常来自 Fetcher.fetch_all。
+    records (callable): records(url) 返回传给 convert_job 的清单记录。
+    jobs (int): 进程数，大于 1 时在进程池中解析与转换。
+    metrics (Metrics): 可选，记录各阶段耗时；进程池中的耗时由子进程传回后合并（不做 cProfile 分析）。
+    """
+    timer = metrics if metrics and metrics.enabled else None
+    if jobs <= 1:
+        for url, body, error in pages:
+            if error:
+                yield url, None, error
+                continue
+            try:
+                yield url, convert_job(url, body, github_id, parser, records(url), tidy, template, timer), None
+            except Exception as e:
+                yield url, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for url, body, error in pages:
+            future = None if error else executor.submit(convert_job, url, body, github_id, parser, records(url), tidy,
+                                                        template, timed=bool(timer))
+            pending.append((url, future, error))
+            # 限制在途任务数，避免抓取远快于转换时占用过多内存
+            while len(pending) > jobs * 2:
+                yield _collect(*pending.popleft(), timer)
+        while pending:
+            yield _collect(*pending.popleft(), timer)
+
+def _collect(url, future, error, timer=None):
+    if error:
+        return url, None, error
+    try:
+        result = future.result()
+    except Exception as e:
+        return url, None, e
+    if timer:
+        timer.merge(result.pop('timings'))
+    return url, result, None
 
-    for url in urls:
+def main():
+    parser = argparse.ArgumentParser(description='将 ITS FOSS 文章转换为 Markdown')
+    parser.add_argument('--github-id', help='选题人的 GitHub ID，缺省时交互输入')
+    parser.add_argument('--urls', default='urls.txt', help='URL 列表文件 (默认: urls.txt)')
+    parser.add_argument('--discover', action='store_true',
+                        help='从 ITS FOSS 与 ITS FOSS News 的 RSS 发现新文章，代替 URL 列表文件')
+    parser.add_argument('--feed', action='append', metavar='URL',
+                        help='RSS/Atom/站点地图（或站点地图索引）的 URL 或本地路径，可重复，隐含 --discover')
+    parser.add_argument('--since', type=discover.parse_since, help='只发现该日期（YYYY-MM-DD）之后或最近 N 天发布的文章')
+    parser.add_argument('--keyword', action='append', help='只发现标题、分类或 URL 中包含该关键词的文章，可重复')
+    parser.add_argument('--limit', type=int, help='最多发现的文章数')
+    parser.add_argument('--seen', default=discover.SEEN_PATH, help=f'已处理文章的记录文件 (默认: {discover.SEEN_PATH})')
+    parser.add_argument('--workers', type=int, default=fetcher.MAX_WORKERS, help='并发抓取数')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='解析与转换使用的进程数，0 表示 CPU 核数 (默认: 1)')
+    parser.add_argument('--template', default=TEMPLATE_PATH, help='Markdown 模板路径 (默认: 脚本目录下的 template.md)')
+    parser.add_argument('--format', action='store_true', help='写入前用 format_fix 整理行首空格与空行')
+    parser.add_argument('--assets', action='store_true',
+                        help='为每篇文章写入资源清单 <文件名>.assets.json（图片、视频的 URL 及引用它的标签），供 assets.py 下载')
+    parser.add_argument('-v', '--verbose', action='store_true', help='出错时打印完整的调用栈')
+    parser.add_argument('--per-host', type=int, default=fetcher.PER_HOST_LIMIT, help='单个主机的最大并发数')
+    parser.add_argument('--timeout', type=float, default=fetcher.TIMEOUT[1], help='读取超时（秒）')
+    parser.add_argument('--force', action='store_true', help='忽略转换清单，重新转换所有 URL')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help=f'转换清单文件 (默认: {MANIFEST_PATH})')
+    parser.add_argument('--parser', default=PARSER, choices=PARSERS, help='HTML 解析后端 (默认: html.parser)')
+    parser.add_argument('--cache-dir', default=http_cache.CACHE_DIR, help='HTML 缓存目录')
+    parser.add_argument('--no-cache', action='store_true', help='不使用本地 HTML 缓存')
+    parser.add_argument('--offline', action='store_true', help='离线模式：只使用缓存，不访问网络')
+    parser.add_argument('--cache-max-age', type=float, default=http_cache.MAX_AGE / 86400, help='缓存条目保留天数')
+    parser.add_argument('--cache-max-size', type=float, default=http_cache.MAX_BYTES / 1024 / 1024, help='缓存总大小上限（MB）')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    stats = metrics.from_args(args)
+
+    github_id = args.github_id or input("请输入GitHub ID: ")
+
+    if args.offline and args.no_cache:
+        parser.error('--offline 需要启用缓存')
+    cache = None
+    if not args.no_cache:
+        cache = http_cache.HTTPCache(args.cache_dir, max_age=args.cache_max_age * 86400,
+                                     max_bytes=int(args.cache_max_size * 1024 * 1024))
+
+    session = fetcher.create_session(headers, pool_size=args.workers)
+    page_fetcher = fetcher.Fetcher(session, max_workers=args.workers, per_host=args.per_host,
+                                   timeout=(fetcher.TIMEOUT[0], args.timeout),
+                                   cache=cache, offline=args.offline, metrics=stats)
+
+    manifest = Manifest(args.manifest)
+    seen = None
+    if args.discover or args.feed:
+        # 发现是惰性的：订阅源在抓取文章的同时继续读取，新发现的 URL 直接进入抓取与转换
+        seen = discover.SeenState(args.seen)
+        urls = discover.discover(args.feed or discover.DEFAULT_FEEDS, page_fetcher.fetch, seen,
+                                 args.since, args.keyword)
+        if args.limit:
+            urls = islice(urls, args.limit)
+    else:
+        with open(args.urls) as f:
+            urls = [line.strip() for line in f if line.strip()]
+
+    jobs = args.jobs or os.cpu_count() or 1
+    skipped = 0
+    errors = []
+
+    options = options_fingerprint(github_id, args.parser, args.template, args.format)
+
+    def records(url):
+        return None if args.force else manifest.current_record(url, CONVERTER_VERSION, options)
+
+    # 抓取在后台线程中并发进行，解析与转换在本进程或进程池中进行；
+    # 结果按 urls.txt（或发现）的顺序写入，文件名冲突时与串行运行一样由后面的 URL 覆盖
+    pages = page_fetcher.fetch_all(urls)
+    for url, result, error in convert_all(pages, github_id, args.parser, records, jobs, args.format, args.template,
+                                          stats):
         try:
-            print(f"处理 {url}")
-            response = requests.get(url, headers=headers)
-            response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # 元数据提取
-            og_title = soup.find('meta', property='og:title')['content']
-            publish_time = soup.find('meta', property='article:modified_time')['content']
-            date_str = datetime.fromisoformat(publish_time[:-1]).strftime('%Y%m%d')
-            og_description = soup.find('meta', property='og:description')
-            summary = og_description['content'].strip() if og_description else ''
-
-            # 生成文件名
-            safe_title = sanitize_filename(og_title)
-            filename = f"{date_str}-{safe_title}.md"
-
-            # 标题提取
-            title = soup.find('h1', class_='post-hero__title').get_text(strip=True)
-
-            # 作者信息
-            author_span = soup.find('span', class_=lambda c: c and c.startswith('post-info__author'))
-            author_link_tag = author_span.find('a') if author_span else None
-            author = "Unknown"
-            author_link = "#"
-
-            if author_span and author_link_tag:
-                href = author_link_tag.get('href', '')
-                if 'post-info__author' in author_span['class']:
-                    base_url = 'https://itsfoss.com'
-                else:
-                    base_url = 'https://news.itsfoss.com'
-                author_link = f"{base_url}{href}"
-                author = author_link_tag.get_text(strip=True)
-
-            # 分类判断
-            domain = urlparse(url).netloc
-            category = '新闻' if 'news.' in domain else '技术'
-
-            # 正文处理
-            article = soup.find('article', class_='post')
-            content = process_article(article)
-
-            # 写入文件
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write('---\n')
-                f.write(f'title: {title}\n')
-                f.write('date: {{release_date}}\n')
-                f.write('abbrlink: \n')
-                f.write('author:\n')
-                f.write('  - fosscope-translation-team\n')
-                f.write('  - {{translator}}\n')
-                f.write('  - {{proofreader}}\n')
-                f.write('banner: {{cover_image}}\n')
-                f.write('cover: {{cover_image}}\n')
-                f.write('categories:\n')
-                f.write('  - 翻译\n')
-                f.write(f'  - {category}\n')
-                f.write('tags: \n')
-                f.write('  - {{tags}}\n')
-                f.write('authorInfo: |\n')
-                f.write(f'  via: {url}\n\n')
-                f.write(f'  作者：[{author}]({author_link})\n')
-                f.write(f'  选题：[{github_id}](https://github.com/{github_id})\n')
-                f.write('  译者：[{{translator}}](https://github.com/{{translator}})\n')
-                f.write('  校对：[{{proofreader}}](https://github.com/{{proofreader}})\n\n')
-                f.write('  本文由 [FOSScope翻译组](https://github.com/FOSScope/TranslateProject) 原创编译，[开源观察](https://fosscope.com/) 荣誉推出\n')
-                f.write('applied: false # 是否已被申领翻译\n')
-                f.write('translated: false # 是否已翻译完成\n')
-                f.write('proofread: false # 是否已校对完成\n')
-                f.write('published: false # 是否已发布\n')
-                f.write('---\n\n')
-                f.write(f'{summary}\n\n')
-                f.write('<!-- more -->\n\n')
-                f.write(f'{content}\n')
-
-            print(f"已生成文件：{filename}")
+            if error:
+                raise error
+            stats.event('page', url=url, status=result['status'], filename=result['filename'],
+                        seconds=round(result['seconds'], 6))
+            if result['status'] == 'skipped':
+                skipped += 1
+                if args.assets and not os.path.exists(assets.manifest_path(result['filename'])):
+                    # 早先未加 --assets 转换的文章：从已有的输出文件补写资源清单
+                    with open(result['filename'], encoding='utf-8') as f:
+                        assets.write_manifest(result['filename'], f.read(), url)
+                if seen is not None:
+                    seen.add(url)
+                continue
+            with stats('write'):
+                with open(result['filename'], 'w', encoding='utf-8') as f:
+                    f.write(result['markdown'])
+                if args.assets:
+                    assets.write_manifest(result['filename'], result['markdown'], url)
+            manifest.record(url, result['content_hash'], result['modified_time'], result['filename'],
+                            CONVERTER_VERSION, options)
+            if seen is not None:
+                seen.add(url)
+            print(f"已生成文件：{result['filename']}  ({url})")
 
         except Exception as e:
+            errors.append((url, e))
+            stats.count('errors')
+            stats.event('page', url=url, status='failed', error=f"{e.__class__.__name__}: {e}")
             print(f"处理 {url} 出错: {e}")
-            traceback.print_exc()
+            if args.verbose:
+                traceback.print_exception(type(e), e, e.__traceback__)
+
+    manifest.compact()
+    if skipped:
+        print(f"跳过 {skipped} 个未变化的 URL（使用 --force 重新转换）")
+    if errors:
+        print(f"\n共 {len(errors)} 个 URL 处理失败：")
+        for url, e in errors:
+            print(f"  {url}\n    {e.__class__.__name__}: {e}")
+
+    if cache:
+        removed = cache.evict()
+        if removed:
+            print(f"已清理 {removed} 个过期缓存条目")
+
+    if stats.enabled:
+        print('\n' + stats.summary())
+        stats.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,169 @@
+import io
+import os
+import time
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import iterparse
+
+from storage import append_jsonl, read_jsonl
+
+DEFAULT_FEEDS = (
+    'https://itsfoss.com/rss/',
+    'https://news.itsfoss.com/rss/',
+)
+SEEN_PATH = '.discover_seen.jsonl'
+
+# 订阅源中的一篇文章：date 为 datetime.date 或 None，keywords 为分类/标签
+Candidate = namedtuple('Candidate', 'url date title keywords')
+RECORD_TAGS = ('item', 'entry', 'url', 'sitemap')  # RSS、Atom、站点地图、站点地图索引中的一条记录
+
+
+def _local(name):
+    """去掉 XML 命名空间，如 {http://www.sitemaps.org/schemas/sitemap/0.9}loc -> loc。"""
+    return name.rsplit('}', 1)[-1]
+
+
+def parse_date(text):
+    """解析 RSS（RFC 822）或站点地图/Atom（ISO 8601）中的日期，无法解析时返回 None。"""
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).date()
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(text).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_feed(body):
+    """
+    增量解析 RSS、Atom、站点地图或站点地图索引，逐条产出 (类型, Candidate)。
+
+    类型为 'article'（文章）或 'sitemap'（站点地图索引中的子站点地图）。
+    使用 iterparse 边读边解析，每条记录处理完即释放，大型站点地图也不会整体驻留内存。
+
+    参数:
+    body (bytes): 订阅源内容。
+    """
+    fields = {}
+    keywords = []
+    for event, element in iterparse(io.BytesIO(body), events=('start', 'end')):
+        tag = _local(element.tag)
+        if tag in RECORD_TAGS:
+            if event == 'start':
+                # 频道本身的 <title>、<link> 不属于任何文章
+                fields = {}
+                keywords = []
+                continue
+            url = fields.get('loc') or fields.get('link')
+            published = fields.get('pubDate') or fields.get('published') or fields.get('lastmod') or fields.get('updated')
+            if url:
+                kind = 'sitemap' if tag == 'sitemap' else 'article'
+                yield kind, Candidate(url, parse_date(published), fields.get('title', ''), tuple(keywords))
+            element.clear()
+        elif event == 'start':
+            continue
+        elif tag in ('loc', 'title', 'lastmod', 'pubDate', 'published', 'updated'):
+            fields.setdefault(tag, (element.text or '').strip())
+        elif tag == 'link':
+            # RSS 的 <link> 为文本，Atom 的 <link href=...>
+            fields.setdefault('link', (element.get('href') or element.text or '').strip())
+        elif tag in ('category', 'tag'):
+            keywords.append((element.get('term') or element.text or '').strip())
+
+
+def matches(candidate, since=None, keywords=None):
+    """按发布日期（不早于 since）与关键词（标题、分类或 URL 中包含任一关键词，不区分大小写）筛选。"""
+    if since and candidate.date and candidate.date < since:
+        return False
+    if keywords:
+        haystack = ' '.join((candidate.url, candidate.title) + candidate.keywords).lower()
+        return any(keyword.lower() in haystack for keyword in keywords)
+    return True
+
+
+class SeenState:
+    """
+    已处理过的文章 URL（JSON Lines，追加写入），下次发现时跳过。
+
+    只有转换成功（或已是最新）的 URL 才记为已处理，失败的 URL 下次仍会被发现。
+    """
+
+    def __init__(self, path=SEEN_PATH):
+        self.path = path
+        self.urls = set()
+        self._lock = threading.Lock()
+        self.urls.update(record['url'] for record in read_jsonl(path) if 'url' in record)
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def add(self, url):
+        with self._lock:
+            if url in self.urls:
+                return
+            self.urls.add(url)
+            append_jsonl(self.path, {'url': url, 'seen_at': time.time()})
+
+
+def load_source(source, fetch):
+    """读取订阅源：本地文件（如测试用的 bench/feeds）直接读取，否则用 fetch(url) 抓取。"""
+    if not urlparse(source).scheme and os.path.exists(source):
+        with open(source, 'rb') as f:
+            return f.read()
+    return fetch(source)
+
+
+def resolve(base, location):
+    """把站点地图索引中的子站点地图地址解析为绝对 URL 或本地路径。"""
+    if urlparse(location).scheme or urlparse(base).scheme:
+        return urljoin(base, location)
+    return os.path.join(os.path.dirname(base), location)
+
+
+def discover(feeds, fetch, seen=(), since=None, keywords=None, log=print):
+    """
+    依次读取订阅源与站点地图，产出尚未处理且符合筛选条件的文章 URL。
+
+    这是一个生成器：产出第一个 URL 时后面的订阅源还没有读取，调用方（如 Fetcher.fetch_all）
+    可以一边抓取、转换已发现的文章，一边继续发现。站点地图索引中最后修改日期早于 since
+    的子站点地图不会被抓取。
+
+    参数:
+    feeds (iterable): 订阅源或站点地图的 URL 或本地路径。
+    fetch (callable): fetch(url) -> bytes，通常为 Fetcher.fetch（带缓存与条件请求）。
+    seen (container): 已处理的 URL，如 SeenState。
+    since (datetime.date): 只保留该日期及之后发布的文章。
+    keywords (list): 只保留标题、分类或 URL 中包含任一关键词的文章。
+    log (callable): 订阅源读取失败时的提示输出。
+    """
+    pending = list(feeds)
+    emitted = set()
+    while pending:
+        source = pending.pop(0)
+        try:
+            for kind, candidate in parse_feed(load_source(source, fetch)):
+                if kind == 'sitemap':
+                    if not (since and candidate.date and candidate.date < since):
+                        pending.append(resolve(source, candidate.url))
+                    continue
+                url = candidate.url
+                if url in emitted or url in seen or not matches(candidate, since, keywords):
+                    continue
+                emitted.add(url)
+                yield url
+        except Exception as e:
+            log(f"读取订阅源 {source} 出错: {e}")
+
+
+def parse_since(text):
+    """命令行 --since 参数：YYYY-MM-DD 或最近的天数（如 7）。"""
+    if text.isdigit():
+        return date.fromordinal(date.today().toordinal() - int(text))
+    return date.fromisoformat(text)
\ No newline at end of file
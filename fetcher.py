@@ -0,0 +1,200 @@
+import time
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_cache import CacheMiss
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+MAX_WORKERS = 8          # 全局并发抓取数
+PER_HOST_LIMIT = 4       # 同一主机的最大并发数
+TIMEOUT = (10, 30)       # (连接超时, 读取超时)，单位秒
+RETRIES = 3              # 连接错误及 429/5xx 的重试次数
+BACKOFF_FACTOR = 0.5     # 指数退避系数：0.5s, 1s, 2s ...
+QUEUE_POLL = 0.1         # fetch_all 后台线程在队列已满时检查是否应停止的间隔，单位秒
+
+_DONE = object()    # fetch_all 队列中表示 URL 序列结束
+_FAILED = object()  # fetch_all 队列中表示读取 URL 序列出错
+
+
+def create_session(headers=None, pool_size=MAX_WORKERS, retries=RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """
+    创建共享连接池的 requests 会话，自带重试与退避。
+
+    参数:
+    headers (dict): 默认请求头，缺省为 DEFAULT_HEADERS。
+    pool_size (int): 每个主机保持的 keep-alive 连接数。
+    retries (int): 最大重试次数。
+    backoff_factor (float): 指数退避系数。
+
+    返回:
+    requests.Session: 配置好的会话。
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(headers or DEFAULT_HEADERS)
+    return session
+
+
+class HostLimiter:
+    """按主机名限制并发请求数。"""
+
+    def __init__(self, limit=PER_HOST_LIMIT):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores = defaultdict(lambda: threading.BoundedSemaphore(self.limit))
+
+    def __call__(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            return self._semaphores[host]
+
+
+class Fetcher:
+    """
+    有界并发的页面抓取器。
+
+    所有请求共用一个会话（同一个连接池），全局并发由线程池大小决定，
+    单主机并发由 HostLimiter 限制。
+    """
+
+    def __init__(self, session=None, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, timeout=TIMEOUT,
+                 cache=None, offline=False, metrics=None):
+        self.session = session or create_session(pool_size=max_workers)
+        self.max_workers = max_workers
+        self.limiter = HostLimiter(per_host)
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.metrics = metrics
+
+    def fetch(self, url):
+        """
+        抓取单个页面，返回原始 HTML 字节。
+
+        启用缓存时发送条件请求，服务器返回 304 则直接使用本地副本；
+        离线模式下只读缓存，从不访问网络。
+        传入 metrics 时记录 'fetch' 阶段耗时、其中等待主机并发名额的时间（'fetch:wait'），
+        以及缓存命中（cache:hit）、重新验证（cache:revalidated）与未命中（cache:miss）的次数。
+        """
+        if not self.metrics or not self.metrics.enabled:
+            return self._fetch(url)
+        with self.metrics('fetch'):
+            return self._fetch(url)
+
+    def _fetch(self, url):
+        entry = self.cache.get(url) if self.cache else None
+        if self.offline:
+            if entry is None:
+                raise CacheMiss(f"离线模式下缓存中没有该页面: {url}")
+            self._count('cache:hit')
+            return self.cache.read(entry)
+
+        request_headers = self.cache.conditional_headers(entry) if entry else {}
+        waiting = time.perf_counter()
+        with self.limiter(url):
+            if self.metrics:
+                self.metrics.observe('fetch:wait', time.perf_counter() - waiting)
+            response = self.session.get(url, headers=request_headers, timeout=self.timeout)
+
+        if response.status_code == 304 and entry:
+            self._count('cache:revalidated')
+            self.cache.touch(url, entry)
+            body = self.cache.read(entry)
+        else:
+            response.raise_for_status()
+            body = response.content
+            if self.cache:
+                self._count('cache:miss')
+                self.cache.store(url, body, response.headers)
+        return body
+
+    def _count(self, name):
+        if self.metrics:
+            self.metrics.count(name)
+
+    def fetch_all(self, urls):
+        """
+        并发预取页面，并按输入顺序逐个产出结果。
+
+        URL 序列在后台线程中读取并提交下载，因此由发现（读取订阅源、站点地图）产生的慢速
+        生成器不会阻塞调用方：第一个页面下载完成即可产出并开始转换，同时后台继续发现与下载。
+        已提交但尚未被调用方取走的页面最多 max_workers * 2 个，抓取远快于转换时后台会暂停。
+        按输入顺序产出可保证与串行运行时的写文件顺序一致。
+
+        参数:
+        urls (iterable): URL 序列（可以是生成器，只在后台线程中迭代）。
+
+        返回:
+        generator: 产出 (url, body, error)，成功时 error 为 None，失败时 body 为 None。
+        """
+        window = max(1, self.max_workers * 2)
+        pending = queue.Queue(maxsize=window)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=QUEUE_POLL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def produce():
+                try:
+                    for url in urls:
+                        if not put((url, executor.submit(self.fetch, url))):
+                            return
+                except Exception as e:
+                    put((_FAILED, e))  # 读取 URL 序列出错，交给调用方抛出
+                finally:
+                    put((_DONE, None))
+
+            producer = threading.Thread(target=produce, name='fetch-producer', daemon=True)
+            producer.start()
+            try:
+                while True:
+                    url, future = pending.get()
+                    if url is _DONE:
+                        break
+                    if url is _FAILED:
+                        raise future
+                    yield self._result(url, future)
+            finally:
+                # 调用方提前停止（如出错或被中断）时不再提交新的下载，取消尚未开始的下载
+                stop.set()
+                while True:
+                    try:
+                        url, future = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    if url not in (_DONE, _FAILED):
+                        future.cancel()
+
+    @staticmethod
+    def _result(url, future):
+        try:
+            return url, future.result(), None
+        except Exception as e:
+            return url, None, e
\ No newline at end of file
@@ -1,5 +1,102 @@
+import io
 import os
 import re
+import sys
+import time
+import argparse
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from storage import atomic_open
+
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+MAX_BLANK_LINES = 2  # 最多保留的连续空行数
+INDENTS = ('    ', '\t')  # 缩进代码块的行首
+
+# 一次匹配同时得到行首空白的长度与行的标记（元信息分隔线或代码块围栏）
+LINE_RE = re.compile(r'(\s*)(---|```)?')
+
+# 状态机的状态
+BODY, FRONT_MATTER, CODE = 'body', 'front_matter', 'code'
+
+
+def format_lines(lines):
+    """
+    逐行处理Markdown内容，删除指定区域的行首空格，并规范化空行。
+
+    这是一个单遍的流式状态机：每读入一行就产出 (原始行, 处理后的行)，
+    被合并掉的多余空行对应的处理结果为 None，因此不需要把整个文件读入内存。
+
+    - 元信息只能出现在文件开头（第一行为 ---），原样保留；
+      正文中的 --- 是分隔线，按普通行处理；
+    - 围栏代码块内的行移除行首空白；
+    - 围栏之外以 4 个空格或制表符开头的缩进代码块保留原始格式；
+    - 列表项及其他行移除行首空白；
+    - 连续空行最多保留 MAX_BLANK_LINES 个。
+
+    参数:
+    lines (iterable): 按行迭代的文本（如以文本模式打开的文件对象）。
+
+    返回:
+    generator: 产出 (原始行, 处理后的行或 None)。
+    """
+    state = BODY
+    blank_lines = 0
+    match_line = LINE_RE.match
+
+    for number, line in enumerate(lines):
+        content = line[:-1] if line.endswith('\n') else line
+        m = match_line(content)
+        stripped_line = content[m.end(1):]
+
+        if not stripped_line:
+            # 空行（包括只含空白的行）
+            blank_lines += 1
+            yield line, '\n' if blank_lines <= MAX_BLANK_LINES else None
+            continue
+        blank_lines = 0
+
+        marker = m.group(2)
+        if state == FRONT_MATTER:
+            if marker == '---':
+                state = BODY
+                processed = stripped_line + '\n'
+            else:
+                processed = line # 元数据区域内容保持不变
+        elif marker == '---' and number == 0:
+            state = FRONT_MATTER
+            processed = stripped_line + '\n'
+        elif marker == '```': # 代码块开始/结束行
+            state = BODY if state == CODE else CODE
+            processed = stripped_line + '\n'
+        elif state == CODE or not content.startswith(INDENTS):
+            processed = stripped_line + '\n' # 代码块内的行、列表项及普通行，移除行首空白
+        else:
+            processed = line # 缩进代码块 (4个空格或制表符开头)，在代码块之外的缩进代码需要保留
+
+        yield line, processed
+
+
+def _open_text(text):
+    """把 str 或 UTF-8 bytes 包装为按行迭代的文本流，换行符的处理与以文本模式打开文件相同。"""
+    if isinstance(text, (bytes, bytearray)):
+        return io.TextIOWrapper(io.BytesIO(text), encoding='utf-8')
+    return io.StringIO(text, newline=None)
+
+
+def format_text(text):
+    """
+    在内存中格式化Markdown内容，供 convert.py、translate.py 等直接调用。
+
+    参数:
+    text (str | bytes): Markdown内容，bytes 按 UTF-8 解码。
+
+    返回:
+    str: 处理后的内容，换行符统一为 \\n。
+    """
+    return "".join(processed for _, processed in format_lines(_open_text(text)) if processed is not None)
+
 
 def process_markdown_file(filepath):
     """
@@ -12,94 +109,185 @@ def process_markdown_file(filepath):
     str: 处理后的Markdown文件内容。
     """
     with open(filepath, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+        return "".join(processed for _, processed in format_lines(f) if processed is not None)
 
-    in_metadata = False
-    in_code_block = False # 新增：标记是否在代码块内
-    metadata_end_line = -1
-    processed_lines = []
-    consecutive_blank_lines = 0
 
-    # 步骤1：定位元数据区域和代码块区域，并处理非元数据区域的行首空格
-    for i, line in enumerate(lines):
+def needs_format(filepath):
+    """
+    判断文件处理后是否会发生变化，读到第一处不同即返回，不生成完整的处理结果。
 
-        stripped_line = line.lstrip() # 移除行首所有空格，用于判断类型 (提前到循环最前面)
+    文件以通用换行模式读取，仅换行符（CRLF/LF）不同不视为变化。
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return any(processed != line for line, processed in format_lines(f))
 
-        if stripped_line.startswith('---'):
-            if not in_metadata:
-                in_metadata = True
-            else:
-                in_metadata = False
-                metadata_end_line = i # 记录元数据结束行
-            processed_lines.append(stripped_line + '\n') # 元数据行, 使用stripped_line, 并添加换行符
-            continue
 
-        if in_metadata:
-            processed_lines.append(line) # 元数据区域内容保持不变
-            continue
+def format_file(filepath, check=False, timer=None):
+    """
+    就地格式化单个文件。
 
+    内容没有变化时不写文件（保留修改时间）；需要修改时先流式写入同目录下的
+    临时文件，再原子替换原文件，中途出错或被中断不会留下写了一半的文件。
+
+    参数:
+    filepath (str): Markdown文件的路径。
+    check (bool): 只检查是否需要修改，不写文件。
+    timer (callable): 可选，timer(阶段名) 返回用于计时的上下文管理器，
+                      检查与写入分别计入 'format:check' 与 'format:write' 阶段。
+
+    返回:
+    bool: 文件是否（需要）被修改。
+    """
+    stage = timer or _null_stage
+    with stage('format:check'):
+        if not needs_format(filepath):
+            return False
+    if check:
+        return True
+
+    with stage('format:write'):
+        with open(filepath, 'r', encoding='utf-8') as src, atomic_open(filepath) as dst:
+            for _, processed in format_lines(src):
+                if processed is not None:
+                    dst.write(processed)
+    return True
 
-        if stripped_line.startswith('```'): # 代码块开始/结束行 (`)
-            if not in_code_block:
-                in_code_block = True
-            else:
-                in_code_block = False
-            processed_lines.append(stripped_line + '\n') # 代码块标识行, 使用stripped_line, 并添加换行符
-            continue
 
-        if in_code_block:
-            processed_lines.append(stripped_line + '\n') # 代码块内的行，移除所有行首空格和制表符, 并添加换行符
+def iter_markdown_files(paths, recursive=True):
+    """
+    展开命令行给出的文件与目录，产出其中的Markdown文件路径。
+
+    目录按名称排序遍历，跳过以 . 开头的隐藏目录（如 .git）。
+    直接给出的文件不检查扩展名。
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
             continue
+        for root, dirs, files in os.walk(path):
+            if recursive:
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            else:
+                dirs[:] = []
+            for filename in sorted(files):
+                if filename.lower().endswith(MARKDOWN_EXTENSIONS): # 检查文件是否是Markdown文件
+                    yield os.path.join(root, filename)
 
 
-        if re.match(r'^    ', line) or re.match(r'^\t', line): # 缩进代码块 (4个空格或制表符开头)，在代码块之外的缩进代码需要保留
-            processed_lines.append(line) # 缩进代码行保留原始格式
-        elif re.match(r'^[-*+] ', stripped_line): # 无序列表
-            processed_lines.append(stripped_line + '\n') # 移除列表项前的空格, 并添加换行符
-        elif re.match(r'^\d+\. ', stripped_line) or re.match(r'^\d+\) ', stripped_line): # 有序列表
-            processed_lines.append(stripped_line + '\n') # 移除列表项前的空格, 并添加换行符
-        elif stripped_line == '\n': # 空行 （只包含换行符，或者去除空格后是空行）
-            processed_lines.append(stripped_line) # 空行保留，后续处理空行数量
-        else:
-            processed_lines.append(stripped_line + '\n') # 非特殊格式行，移除行首空格, 并添加换行符
+def _null_stage(name):
+    return nullcontext()
 
 
-    # 步骤2：清除大于两个的空行 (这部分代码保持不变)
-    final_processed_lines = []
-    consecutive_blank_lines = 0
-    for line in processed_lines:
-        if line.strip() == '': # 再次判断是否是空行 (处理步骤1后可能产生的空行)
-            consecutive_blank_lines += 1
-            if consecutive_blank_lines <= 2:
-                final_processed_lines.append('\n') # 保留最多两个空行
-        else:
-            final_processed_lines.append(line)
-            consecutive_blank_lines = 0 # 重置计数器
+def _format_job(filepath, check, timer=None):
+    start = time.perf_counter()
+    try:
+        modified, error = format_file(filepath, check, timer), None
+    except (OSError, UnicodeDecodeError) as e:
+        modified, error = False, e
+    return filepath, modified, error, time.perf_counter() - start
+
+
+def process_paths(paths, check=False, jobs=None, recursive=True, metrics=None):
+    """
+    并行处理多个文件或目录，按输入顺序产出 (文件路径, 是否修改, 错误)。
 
-    return "".join(final_processed_lines)
+    参数:
+    paths (list): 文件或目录路径。
+    check (bool): 只检查，不写文件。
+    jobs (int): 进程数，默认为 CPU 核数；为 1 时在当前进程中串行处理。
+    recursive (bool): 是否递归处理子目录。
+    metrics (Metrics): 可选，记录每个文件的耗时（'format' 阶段及每个文件一条 'file' 记录）；
+                       串行处理时还分别记录检查与写入的耗时。
+    """
+    timer = metrics if metrics and metrics.enabled else None
+    for filepath, modified, error, seconds in _run_jobs(iter_markdown_files(paths, recursive), check, jobs, timer):
+        if timer:
+            timer.observe('format', seconds)
+            timer.event('file', path=filepath, modified=modified, seconds=round(seconds, 6),
+                        error=f"{error.__class__.__name__}: {error}" if error else None)
+        yield filepath, modified, error
+
+
+def _run_jobs(files, check, jobs, timer):
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1:
+        for filepath in files:
+            yield _format_job(filepath, check, timer)
+        return
+
+    files = list(files)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # 单个文件很小，按批分发以减少进程间通信开销
+        chunksize = max(1, len(files) // (jobs * 8))
+        yield from executor.map(_format_job, files, [check] * len(files), chunksize=chunksize)
 
 
-def process_directory(directory_path):
+def format_paths(paths, check=False, jobs=None, recursive=True, metrics=None):
     """
-    处理指定目录下的所有Markdown文件。
+    处理多个文件或目录，并逐个报告被修改（或需要修改）的文件。
+
+    返回:
+    tuple: (被修改或需要修改的文件列表, 处理失败的 (文件, 错误) 列表)。
+    """
+    changed = []
+    errors = []
+    for filepath, modified, error in process_paths(paths, check, jobs, recursive, metrics):
+        if error:
+            errors.append((filepath, error))
+            print(f"处理文件出错: {filepath}: {error}")
+        elif modified:
+            changed.append(filepath)
+            print(f"{'需要格式化' if check else '已格式化'}: {filepath}")
+    return changed, errors
+
+
+def process_directory(directory_path, check=False, jobs=None, recursive=True):
+    """
+    处理指定目录（默认包括子目录）下的所有Markdown文件。
 
     参数:
     directory_path (str): 目录路径。
+    check (bool): 只报告需要修改的文件，不写文件。
+    jobs (int): 进程数，默认为 CPU 核数。
+    recursive (bool): 是否递归处理子目录。
+
+    返回:
+    tuple: 同 format_paths。
     """
-    for filename in os.listdir(directory_path):
-        if filename.lower().endswith(('.md', '.markdown')): # 检查文件是否是Markdown文件
-            filepath = os.path.join(directory_path, filename)
-            print(f"正在处理文件: {filepath}")
-            processed_content = process_markdown_file(filepath)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(processed_content)
-            print(f"文件处理完成: {filepath}")
+    return format_paths([directory_path], check, jobs, recursive)
 
 
-if __name__ == "__main__":
-    path = input("请输入包含Markdown文件的目录路径: ")
-    if os.path.isdir(path):
-        process_directory(path)
-        print("所有Markdown文件处理完成。")
+def main():
+    parser = argparse.ArgumentParser(description='规范化 Markdown 文件的行首空格与空行')
+    parser.add_argument('paths', nargs='*', help='Markdown 文件或目录，目录会递归处理（不指定时交互输入）')
+    parser.add_argument('--check', action='store_true', help='只列出需要格式化的文件，不写文件；存在时以状态 1 退出')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='并行进程数，0 表示 CPU 核数 (默认: 0)')
+    parser.add_argument('--no-recursive', action='store_true', help='不处理子目录')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    stats = metrics.from_args(args)
+
+    paths = args.paths
+    if not paths:
+        path = input("请输入包含Markdown文件的目录路径: ")
+        if not os.path.isdir(path):
+            print("输入的路径不是一个有效的目录。")
+            return 2
+        paths = [path]
+
+    changed, errors = format_paths(paths, args.check, args.jobs, not args.no_recursive, stats)
+    if args.check:
+        print(f"{len(changed)} 个文件需要格式化。" if changed else "所有Markdown文件格式正确。")
     else:
-        print("输入的路径不是一个有效的目录。")
\ No newline at end of file
+        print(f"所有Markdown文件处理完成，修改了 {len(changed)} 个文件。")
+    if stats.enabled:
+        print('\n' + stats.summary())
+        stats.close()
+    if errors:
+        print(f"{len(errors)} 个文件处理失败。")
+        return 1
+    return 1 if args.check and changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
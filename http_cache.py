@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from storage import atomic_write
+
+CACHE_DIR = '.cache/http'
+MAX_AGE = 30 * 24 * 3600        # 条目最长保留时间（秒）
+MAX_BYTES = 512 * 1024 * 1024   # 缓存正文总大小上限（字节）
+
+
+class CacheMiss(LookupError):
+    """离线模式下请求的 URL 不在缓存中。"""
+
+
+class HTTPCache:
+    """
+    按 URL 索引、按内容寻址的原始 HTML 缓存。
+
+    目录结构:
+        objects/ab/abcdef...   以正文 SHA-256 命名的内容块，相同正文只存一份
+        urls/12/12345...json   以 URL 的 SHA-256 命名的元数据（ETag、Last-Modified、正文哈希等）
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_age=MAX_AGE, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _meta_path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'urls', key[:2], key + '.json')
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def get(self, url):
+        """返回 URL 的缓存元数据，不存在或内容块缺失时返回 None。"""
+        try:
+            with open(self._meta_path(url), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url or not os.path.exists(self._object_path(entry['sha256'])):
+            return None
+        return entry
+
+    def read(self, entry):
+        """读取缓存条目对应的原始正文（bytes）。"""
+        with open(self._object_path(entry['sha256']), 'rb') as f:
+            return f.read()
+
+    def conditional_headers(self, entry):
+        """根据缓存条目生成条件请求头。"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, body, headers):
+        """保存响应正文与校验信息，返回新的元数据。"""
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            atomic_write(object_path, body)
+        now = time.time()
+        entry = {
+            'url': url,
+            'sha256': digest,
+            'size': len(body),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': now,
+            'validated_at': now,
+        }
+        self._write_meta(url, entry)
+        return entry
+
+    def touch(self, url, entry):
+        """服务器返回 304 时刷新校验时间。"""
+        entry = dict(entry, validated_at=time.time())
+        self._write_meta(url, entry)
+        return entry
+
+    def _write_meta(self, url, entry):
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        atomic_write(self._meta_path(url), data)
+
+    def _iter_entries(self):
+        urls_dir = os.path.join(self.directory, 'urls')
+        for root, _, files in os.walk(urls_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        yield path, json.load(f)
+                except (OSError, ValueError):
+                    yield path, None
+
+    def evict(self):
+        """
+        按淘汰策略清理缓存：先删除超过 max_age 未校验的条目，
+        再按最近校验时间从旧到新删除，直到正文总大小不超过 max_bytes，
+        最后回收不再被引用的内容块。
+
+        返回:
+        int: 删除的条目数。
+        """
+        with self._lock:
+            now = time.time()
+            removed = 0
+            live = []
+            for path, entry in self._iter_entries():
+                if entry is None or now - entry.get('validated_at', 0) > self.max_age:
+                    os.remove(path)
+                    removed += 1
+                else:
+                    live.append((entry.get('validated_at', 0), path, entry))
+
+            # 同一内容块可被多个 URL 引用，按去重后的大小计算
+            live.sort(key=lambda item: item[0])
+            referenced = {}
+            for _, _, entry in live:
+                referenced[entry['sha256']] = referenced.get(entry['sha256'], 0) + 1
+            sizes = {entry['sha256']: entry['size'] for _, _, entry in live}
+            total = sum(sizes.values())
+            for _, path, entry in live:
+                if total <= self.max_bytes:
+                    break
+                os.remove(path)
+                removed += 1
+                referenced[entry['sha256']] -= 1
+                if referenced[entry['sha256']] == 0:
+                    total -= entry['size']
+                    del referenced[entry['sha256']]
+
+            objects_dir = os.path.join(self.directory, 'objects')
+            for root, _, files in os.walk(objects_dir):
+                for name in files:
+                    if name not in referenced:
+                        os.remove(os.path.join(root, name))
+            return removed
\ No newline at end of file
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+
+from storage import append_jsonl, atomic_open, read_jsonl
+
+JOURNAL_PATH = os.path.join(os.path.expanduser('~'), '.fosscope', 'translate_journal.jsonl')
+
+# 文件状态
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+def source_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+class Batch:
+    """一次批量翻译在日志中的状态。"""
+
+    def __init__(self, batch_id, project, category, files, created_at):
+        self.id = batch_id
+        self.project = project
+        self.category = category
+        self.files = files
+        self.created_at = created_at
+        self.states = {file: {'state': QUEUED, 'attempts': 0} for file in files}
+        self.chunks = {}  # 文件名 -> {分块序号: 记录}
+        self.finished = False
+
+    def pending(self):
+        """尚未成功的文件（排队、中断或失败），保持原批次中的顺序。"""
+        return [file for file in self.files if self.states[file]['state'] != DONE]
+
+    def count(self, state):
+        return sum(1 for record in self.states.values() if record['state'] == state)
+
+
+class JobJournal:
+    """
+    批量翻译的持久化任务日志（JSON Lines，追加写入，每条记录立即落盘）。
+
+    记录类型：
+        batch  —— 新批次：batch, project, category, files
+        file   —— 文件状态变化：batch, file, state, attempts, error
+        chunk  —— 分块译文：batch, file, index, hash, text, request_id, attempts
+        end    —— 批次中的文件全部成功
+
+    程序崩溃或网络中断后，未结束的批次可以继续：已成功的文件跳过，
+    未完成文件中已翻译的分块（原文哈希一致时）直接复用，只请求剩余分块。
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.batches = {}
+        self._lock = threading.Lock()
+        for record in read_jsonl(path):
+            try:
+                self._apply(record)
+            except KeyError:
+                continue
+
+    def _apply(self, record):
+        kind = record['type']
+        if kind == 'batch':
+            self.batches[record['batch']] = Batch(record['batch'], record['project'], record['category'],
+                                                  record['files'], record['time'])
+            return
+        batch = self.batches.get(record['batch'])
+        if batch is None:
+            return
+        if kind == 'file':
+            batch.states[record['file']] = {key: record.get(key) for key in ('state', 'attempts', 'error')}
+        elif kind == 'chunk':
+            batch.chunks.setdefault(record['file'], {})[record['index']] = record
+        elif kind == 'end':
+            batch.finished = True
+
+    def _append(self, record):
+        record['time'] = time.time()
+        with self._lock:
+            self._apply(record)
+            append_jsonl(self.path, record)
+
+    def start_batch(self, project, category, files):
+        """登记一个新批次，所有文件处于排队状态，返回 Batch。"""
+        batch_id = uuid.uuid4().hex[:12]
+        self._append({'type': 'batch', 'batch': batch_id, 'project': os.path.abspath(project),
+                      'category': category, 'files': list(files)})
+        return self.batches[batch_id]
+
+    def set_state(self, batch, file, state, error=None):
+        """记录文件状态；进入 running 时累加该文件的尝试次数。"""
+        attempts = batch.states.get(file, {}).get('attempts') or 0
+        if state == RUNNING:
+            attempts += 1
+        self._append({'type': 'file', 'batch': batch.id, 'file': file, 'state': state,
+                      'attempts': attempts, 'error': error})
+
+    def record_chunk(self, batch, file, index, source, text, request_id=None, attempts=1):
+        """记录一个已完成分块的译文及其 API 请求 ID、请求次数。"""
+        self._append({'type': 'chunk', 'batch': batch.id, 'file': file, 'index': index,
+                      'hash': source_hash(source), 'text': text, 'request_id': request_id,
+                      'attempts': attempts})
+
+    def chunk(self, batch, file, index, source):
+        """返回已记录的分块译文；原文已被修改（哈希不一致）时返回 None。"""
+        record = batch.chunks.get(file, {}).get(index)
+        if record is None or record['hash'] != source_hash(source):
+            return None
+        return record['text']
+
+    def finish_batch(self, batch):
+        self._append({'type': 'end', 'batch': batch.id})
+
+    def unfinished(self, project, category=None):
+        """返回该项目（及分类）最近一个未结束的批次，没有时返回 None。"""
+        project = os.path.abspath(project)
+        candidates = [batch for batch in self.batches.values()
+                      if not batch.finished and batch.project == project
+                      and (category is None or batch.category == category)]
+        return max(candidates, key=lambda batch: batch.created_at, default=None)
+
+    def compact(self):
+        """删除已结束批次的记录并原子替换日志文件，避免日志无限增长。"""
+        with self._lock:
+            finished = {batch_id for batch_id, batch in self.batches.items() if batch.finished}
+            if not finished or not os.path.exists(self.path):
+                return
+            with open(self.path, encoding='utf-8') as src, atomic_open(self.path) as dst:
+                for line in src:
+                    try:
+                        if json.loads(line)['batch'] in finished:
+                            continue
+                    except (ValueError, KeyError):
+                        continue
+                    dst.write(line)
+            for batch_id in finished:
+                del self.batches[batch_id]
\ No newline at end of file
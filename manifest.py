@@ -0,0 +1,77 @@
+import os
+import time
+import threading
+
+from storage import append_jsonl, read_jsonl, write_jsonl
+
+MANIFEST_PATH = '.convert_manifest.jsonl'
+
+
+def is_unchanged(record, content_hash, modified_time):
+    """页面正文哈希或 article:modified_time 与清单记录一致时视为未变化。"""
+    if record.get('content_hash') == content_hash:
+        return True
+    return modified_time is not None and record.get('modified_time') == modified_time
+
+
+class Manifest:
+    """
+    记录每个 URL 转换结果的持久化清单（JSON Lines，追加写入）。
+
+    每行一条记录，同一 URL 以最后一条为准：
+        url, content_hash, modified_time, filename, converter_version, options, converted_at
+    options 为影响输出的转换选项的指纹（见 convert.options_fingerprint）。
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._lines = 0
+        for record in read_jsonl(path):
+            self.entries[record['url']] = record
+            self._lines += 1
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def current_record(self, url, converter_version, options=None):
+        """返回仍然有效的记录：转换器版本与转换选项指纹一致且输出文件仍然存在，否则返回 None。"""
+        record = self.entries.get(url)
+        if not record or record.get('converter_version') != converter_version:
+            return None
+        if record.get('options') != options:
+            return None
+        if not os.path.exists(record.get('filename', '')):
+            return None
+        return record
+
+    def is_current(self, url, content_hash, modified_time, converter_version, options=None):
+        """判断 URL 是否无需重新转换：记录仍然有效且页面未变化。"""
+        record = self.current_record(url, converter_version, options)
+        return record is not None and is_unchanged(record, content_hash, modified_time)
+
+    def record(self, url, content_hash, modified_time, filename, converter_version, options=None):
+        """追加一条转换记录并立即落盘，进程中断也不会丢失已完成的记录。"""
+        record = {
+            'url': url,
+            'content_hash': content_hash,
+            'modified_time': modified_time,
+            'filename': filename,
+            'converter_version': converter_version,
+            'options': options,
+            'converted_at': time.time(),
+        }
+        with self._lock:
+            self.entries[url] = record
+            append_jsonl(self.path, record)
+            self._lines += 1
+        return record
+
+    def compact(self):
+        """当重复记录较多时，只保留每个 URL 的最新记录并原子替换清单文件。"""
+        with self._lock:
+            if self._lines <= len(self.entries):
+                return
+            write_jsonl(self.path, self.entries.values())
+            self._lines = len(self.entries)
\ No newline at end of file
@@ -0,0 +1,148 @@
+import re
+from collections import namedtuple
+
+CHUNK_CHARS = 6000  # 单个翻译分块的目标字符数
+
+# 反引号围栏的信息串不能再含反引号，否则是行首的行内代码（如 ``` ls ```）
+FENCE_RE = re.compile(r'^[ \t]*(`{3,}(?=[^`]*$)|~{3,})')
+HEADING_RE = re.compile(r'^#{1,6}[ \t]')
+# 在各篇文章中反复出现的样板标签（备注块、按钮），单独成块以便命中翻译记忆
+BOILERPLATE_RE = re.compile(r'\{%\s*(note|button)\b.*%\}', re.S)
+
+# kind: 'text' 需要翻译；'code' 为围栏代码块，原样保留
+Segment = namedtuple('Segment', 'kind text')
+
+
+def split_front_matter(text):
+    """
+    拆分 YAML 元信息与正文。
+
+    返回:
+    tuple: (元信息（含 --- 分隔行及其后的换行）, 正文)。没有元信息时前者为空字符串。
+    """
+    if not text.startswith('---'):
+        return '', text
+    lines = text.splitlines(keepends=True)
+    if lines[0].rstrip() != '---':
+        return '', text
+    offset = len(lines[0])
+    for line in lines[1:]:
+        offset += len(line)
+        if line.rstrip() == '---':
+            return text[:offset], text[offset:]
+    return '', text
+
+
+def split_padding(text):
+    """拆分文本的首尾空白，返回 (前导空白, 内容, 末尾空白)。"""
+    core = text.strip()
+    if not core:
+        return text, '', ''
+    start = text.index(core)
+    return text[:start], core, text[start + len(core):]
+
+
+def iter_blocks(body):
+    """
+    将正文切分为不可再分的块，依次产出 (kind, text, is_heading)。
+
+    - 围栏代码块（``` 或 ~~~）整体作为一个 'code' 块；
+    - 跨多行的 {% ... %} 标签不会被拆开；
+    - 其余内容按空行分段，空行附在前一段末尾，所有块拼接后与原文完全一致。
+    """
+    block = []
+    fence = None
+    in_tag = False
+
+    def flush():
+        if block:
+            text = ''.join(block)
+            block.clear()
+            return text
+        return None
+
+    for line in body.splitlines(keepends=True):
+        if fence:
+            block.append(line)
+            match = FENCE_RE.match(line)
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) \
+                    and not line.strip()[len(match.group(1)):].strip():
+                fence = None
+                yield 'code', flush(), False
+            continue
+
+        if in_tag:
+            # 标签未闭合前的所有行（包括空行和 ``` 行）都属于同一块
+            block.append(line)
+            if '%}' in line:
+                in_tag = line.rfind('{%') > line.rfind('%}')
+            continue
+
+        match = FENCE_RE.match(line)
+        if match:
+            text = flush()
+            if text:
+                yield 'text', text, HEADING_RE.match(text) is not None
+            fence = match.group(1)
+            block.append(line)
+            continue
+
+        if not line.strip():
+            # 空行附在前一块末尾
+            block.append(line)
+            continue
+
+        if block and not block[-1].strip() or HEADING_RE.match(line):
+            text = flush()
+            if text:
+                yield 'text', text, HEADING_RE.match(text) is not None
+        block.append(line)
+        in_tag = line.rfind('{%') > line.rfind('%}')
+
+    text = flush()
+    if text:
+        kind = 'code' if fence else 'text'
+        yield kind, text, kind == 'text' and HEADING_RE.match(text) is not None
+
+
+def chunk_markdown(body, max_chars=CHUNK_CHARS):
+    """
+    按标题与段落边界将正文分块，代码块单独成段。
+
+    相邻的文本块合并到接近 max_chars 为止；遇到标题且当前分块已超过
+    max_chars 的四分之一时另起一块，使分块尽量对应完整的小节。
+    单独成段的 {% note %} / {% button %} 标签自成一块。单个超长段落不会被拆开。
+
+    参数:
+    body (str): 不含元信息的 Markdown 正文。
+    max_chars (int): 分块的目标字符数。
+
+    返回:
+    list: Segment 列表，所有 text 拼接后与 body 完全一致。
+    """
+    segments = []
+    current = []
+    size = 0
+
+    def flush():
+        nonlocal size
+        if current:
+            segments.append(Segment('text', ''.join(current)))
+            current.clear()
+            size = 0
+
+    for kind, text, is_heading in iter_blocks(body):
+        if kind == 'code':
+            flush()
+            segments.append(Segment('code', text))
+            continue
+        if BOILERPLATE_RE.fullmatch(text.strip()):
+            flush()
+            segments.append(Segment('text', text))
+            continue
+        if current and (size + len(text) > max_chars or is_heading and size >= max_chars // 4):
+            flush()
+        current.append(text)
+        size += len(text)
+    flush()
+    return segments
\ No newline at end of file
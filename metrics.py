@@ -0,0 +1,177 @@
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+PROFILE_TOP = 15  # 每个被分析的阶段在汇总中列出的函数数
+
+
+class Metrics:
+    """
+    convert、format_fix 与 translator 共用的计时与指标记录。
+
+    - 调用 metrics(阶段名)（或 metrics.stage）得到计时用的上下文管理器，
+      可直接作为 convert.process_article 等函数的 timer 参数；
+    - observe 记录在别处测得的耗时（如 API 延迟、首个 token 用时），count 累加计数（如缓存命中、token 数）；
+    - event 写入一条 JSON Lines 记录（如每个页面、每次 API 请求），path 为空时不写文件；
+    - profile 中列出的阶段（'all' 表示全部）用 cProfile 分析，trace_memory 时同时记录这些阶段的内存峰值。
+      同一时刻只分析一个阶段，嵌套或并发的其他阶段只计时。
+
+    enabled 为 False 时所有方法都是空操作，不影响被测代码的性能。线程安全。
+    """
+
+    def __init__(self, path=None, profile=(), trace_memory=False, enabled=True):
+        self.enabled = enabled
+        self.path = path
+        self.profile = set(profile)
+        self.trace_memory = trace_memory
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8') if enabled and path else None
+        self._profiling = False
+        self._profiles = {}
+        self.reset()
+
+    def reset(self):
+        """清空累计的阶段耗时与计数（JSON Lines 文件不受影响）。"""
+        with self._lock:
+            self.stages = {}    # 阶段名 -> [次数, 总耗时, 最大耗时]
+            self.counters = {}
+            self.memory = {}    # 阶段名 -> 内存峰值（字节）
+            self.started = time.perf_counter()
+
+    def __call__(self, name):
+        return self.stage(name)
+
+    def stage(self, name):
+        if not self.enabled:
+            return nullcontext()
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name):
+        profiler = None
+        if (name in self.profile or 'all' in self.profile) and not self._profiling:
+            with self._lock:
+                if not self._profiling:
+                    self._profiling = True
+                    profiler = self._profiles.setdefault(name, cProfile.Profile())
+        # 只在被分析的阶段内跟踪内存分配，其余阶段不受 tracemalloc 的开销影响
+        tracing = profiler and self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler:
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler:
+                profiler.disable()
+                if tracing:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    with self._lock:
+                        self.memory[name] = max(self.memory.get(name, 0), peak)
+                self._profiling = False
+            self.observe(name, elapsed)
+
+    def observe(self, name, seconds):
+        """记录一次耗时。"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def event(self, kind, **fields):
+        """写入一条 JSON Lines 记录：{"event": kind, "ts": 时间戳, ...}。"""
+        if not self._file:
+            return
+        line = json.dumps(dict(event=kind, ts=round(time.time(), 3), **fields), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def snapshot(self):
+        """可序列化的累计数据，用于从子进程传回主进程后 merge。"""
+        with self._lock:
+            return {'stages': {name: list(entry) for name, entry in self.stages.items()},
+                    'counters': dict(self.counters)}
+
+    def merge(self, snapshot):
+        if not self.enabled or not snapshot:
+            return
+        with self._lock:
+            for name, (calls, total, longest) in snapshot['stages'].items():
+                entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += calls
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+            for name, n in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """汇总表：各阶段的次数与耗时、计数，以及被分析阶段的内存峰值与 cProfile 热点。"""
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[0].replace(':', ' '))
+            counters = sorted(self.counters.items())
+            memory = dict(self.memory)
+            profiles = dict(self._profiles)
+            wall = time.perf_counter() - self.started
+        lines = [f"{'阶段':<34}{'次数':>8}{'总耗时(ms)':>12}{'平均(ms)':>10}{'最大(ms)':>10}"]
+        for name, (calls, total, longest) in stages:
+            label = ('  ' + name.split(':', 1)[1]) if ':' in name else name
+            lines.append(f"{label:<34}{calls:>8}{total * 1000:>12.1f}{total / calls * 1000:>10.2f}{longest * 1000:>10.2f}")
+        lines.append(f"{'总用时':<34}{'':>8}{wall * 1000:>12.1f}")
+        if counters:
+            lines.append('')
+            lines += [f"{name:<34}{n:>8}" for name, n in counters]
+        for name, profiler in profiles.items():
+            lines.append('')
+            title = f"cProfile: {name}"
+            if name in memory:
+                title += f"（内存峰值 {memory[name] / 1024 / 1024:.1f} MB）"
+            lines.append(title)
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            lines.append(out.getvalue().strip())
+        return '\n'.join(lines)
+
+    def close(self):
+        """写入汇总记录并关闭 JSON Lines 文件。"""
+        if self._file:
+            snapshot = self.snapshot()
+            self.event('summary', wall=round(time.perf_counter() - self.started, 3),
+                       stages={name: {'calls': calls, 'total': round(total, 6), 'max': round(longest, 6)}
+                               for name, (calls, total, longest) in snapshot['stages'].items()},
+                       counters=snapshot['counters'])
+            self._file.close()
+            self._file = None
+
+
+def add_arguments(parser):
+    """为命令行工具添加统一的指标参数。"""
+    parser.add_argument('--metrics', metavar='FILE', help='把每个页面/文件/请求的耗时等指标以 JSON Lines 追加写入文件，并在结束时打印汇总表')
+    parser.add_argument('--profile', metavar='STAGE', action='append', default=[],
+                        help="用 cProfile 分析指定阶段（可重复，'all' 表示全部），结果列在汇总表之后")
+    parser.add_argument('--trace-memory', action='store_true', help='同时用 tracemalloc 记录被分析阶段的内存峰值')
+
+
+def from_args(args):
+    """按命令行参数创建 Metrics；没有指定任何指标参数时返回停用的实例。"""
+    enabled = bool(args.metrics or args.profile or args.trace_memory)
+    profile = args.profile or (['all'] if args.trace_memory else [])
+    return Metrics(args.metrics, profile, args.trace_memory, enabled=enabled)
\ No newline at end of file
@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import threading
+from collections import namedtuple
+
+from storage import atomic_write
+
+CALIBRATION_PATH = os.path.join(os.path.expanduser('~'), '.fosscope', 'token_calibration.json')
+CALIBRATION_ALPHA = 0.2         # 校准系数的指数滑动平均权重
+DEFAULT_TOKENS_PER_SECOND = 30  # 没有实测数据时假定的单个请求输出速度
+SCHEDULES = ('sjf', 'priority', 'none')
+
+# 离线的分词近似：汉字约 1 个 token，英文单词按长度折算，数字每 3 位 1 个，标点各 1 个
+TOKEN_RE = re.compile(
+    r'(?P<cjk>[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af])'
+    r'|(?P<word>[A-Za-z]+)'
+    r'|(?P<number>\d+)'
+    r'|(?P<space>\s+)'
+    r'|(?P<other>.)',
+    re.S
+)
+PRIORITY_RE = re.compile(r'^priority:\s*(-?\d+)\s*$', re.M)
+
+# 一篇文章的预估：job 为 TranslationJob，tokens 为需要请求 API 的分块的预估值
+FilePlan = namedtuple('FilePlan', 'job requests input_tokens output_tokens cached priority')
+
+
+def count_tokens(text):
+    """按 BPE 分词器的常见行为离线估算 token 数，不依赖具体模型的词表。"""
+    tokens = 0
+    for match in TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'word':
+            tokens += 1 + (len(match.group()) - 1) // 6
+        elif kind == 'number':
+            tokens += (len(match.group()) + 2) // 3
+        elif kind == 'space':
+            # 单词前的空格通常并入下一个 token，换行单独计数
+            tokens += '\n' in match.group()
+        else:
+            tokens += 1
+    return tokens
+
+
+def read_priority(front_matter):
+    """读取元信息中的 priority 字段（整数，越大越先翻译），没有时为 0。"""
+    match = PRIORITY_RE.search(front_matter)
+    return int(match.group(1)) if match else 0
+
+
+class Calibration:
+    """
+    按模型保存的 token 估算校准系数。
+
+    每次 API 返回 usage 时，用实际的 prompt_tokens / completion_tokens 与离线估算值之比
+    更新指数滑动平均，之后的估算乘以该系数；同时记录实测的输出速度用于估算耗时。
+    """
+
+    def __init__(self, model, path=CALIBRATION_PATH):
+        self.model = model
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f).get(model, {})
+        except (OSError, ValueError, AttributeError):
+            saved = {}
+        self.input_ratio = saved.get('input_ratio', 1.0)
+        self.output_ratio = saved.get('output_ratio', 1.0)
+        self.tokens_per_second = saved.get('tokens_per_second', DEFAULT_TOKENS_PER_SECOND)
+        self.samples = saved.get('samples', 0)
+
+    def estimate(self, prompt, content):
+        """估算一次翻译请求的 (输入 token, 输出 token)，输出按与原文长度相当估算。"""
+        raw_input = count_tokens(prompt) + count_tokens(content)
+        raw_output = count_tokens(content)
+        return round(raw_input * self.input_ratio), round(raw_output * self.output_ratio)
+
+    def record(self, prompt, content, usage, seconds=None):
+        """用 API 返回的 usage 更新校准系数。"""
+        raw_input = count_tokens(prompt) + count_tokens(content)
+        raw_output = count_tokens(content)
+        prompt_tokens = usage.get('prompt_tokens')
+        completion_tokens = usage.get('completion_tokens')
+        with self.lock:
+            # 第一条样本直接采用，之后按滑动平均更新，避免默认值拖慢收敛
+            alpha = 1.0 if self.samples == 0 else CALIBRATION_ALPHA
+            if prompt_tokens and raw_input:
+                self.input_ratio += alpha * (prompt_tokens / raw_input - self.input_ratio)
+            if completion_tokens and raw_output:
+                self.output_ratio += alpha * (completion_tokens / raw_output - self.output_ratio)
+            if completion_tokens and seconds:
+                self.tokens_per_second += alpha * (completion_tokens / seconds - self.tokens_per_second)
+            self.samples += 1
+
+    def save(self):
+        """把本模型的校准系数写回文件（保留其他模型的记录）。"""
+        with self.lock:
+            entry = {
+                'input_ratio': self.input_ratio,
+                'output_ratio': self.output_ratio,
+                'tokens_per_second': self.tokens_per_second,
+                'samples': self.samples,
+            }
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[self.model] = entry
+        atomic_write(self.path, json.dumps(data, ensure_ascii=False, indent=2))
+
+
+def plan_job(job, prompt, calibration):
+    """估算一篇文章中尚未命中翻译记忆的分块所需的 token。"""
+    misses = [index for index in job.pending if index not in job.results]
+    input_tokens = output_tokens = 0
+    for index in misses:
+        tokens_in, tokens_out = calibration.estimate(prompt, job.source(index))
+        input_tokens += tokens_in
+        output_tokens += tokens_out
+    return FilePlan(job, len(misses), input_tokens, output_tokens, len(job.pending) - len(misses),
+                    read_priority(job.front_matter))
+
+
+def order_plans(plans, schedule='sjf'):
+    """
+    按调度策略排列文章。
+
+    - sjf：预计 token 少的文章先翻译。在 TPM 限额下单位时间内完成的文章最多，
+      长文章不会挡住后面的短文章；
+    - priority：元信息中 priority 大的先翻译，相同优先级按 sjf；
+    - none：保持选择顺序。
+    """
+    if schedule == 'sjf':
+        return sorted(plans, key=lambda p: p.input_tokens + p.output_tokens)
+    if schedule == 'priority':
+        return sorted(plans, key=lambda p: (-p.priority, p.input_tokens + p.output_tokens))
+    return list(plans)
+
+
+def summarize(plans, config, calibration):
+    """
+    汇总批量翻译的预估值。
+
+    返回:
+    dict: files、requests、input_tokens、output_tokens、cost（按每百万 token 单价计算），
+          minutes（受 RPM/TPM 限额与输出速度中最慢者约束的预计耗时）。
+    """
+    requests = sum(p.requests for p in plans)
+    input_tokens = sum(p.input_tokens for p in plans)
+    output_tokens = sum(p.output_tokens for p in plans)
+    cost = (input_tokens * config['price_input'] + output_tokens * config['price_output']) / 1_000_000
+    minutes = []
+    if config['tpm']:
+        minutes.append((input_tokens + output_tokens) / config['tpm'])
+    if config['rpm']:
+        minutes.append(requests / config['rpm'])
+    if requests:
+        # 并发请求数不超过分块数
+        parallel = min(config['max_workers'], requests)
+        minutes.append(output_tokens / (calibration.tokens_per_second * parallel) / 60)
+    return {
+        'files': len(plans),
+        'requests': requests,
+        'input_tokens': input_tokens,
+        'output_tokens': output_tokens,
+        'cost': cost,
+        'minutes': max(minutes, default=0.0),
+    }
+
+
+def format_summary(summary):
+    text = (f"{summary['files']} 个文件，{summary['requests']} 个请求，"
+            f"预计输入 {summary['input_tokens']} / 输出 {summary['output_tokens']} 个 token，"
+            f"耗时约 {summary['minutes']:.1f} 分钟")
+    if summary['cost']:
+        text += f"，费用约 {summary['cost']:.4f}"
+    return text
\ No newline at end of file
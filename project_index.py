@@ -0,0 +1,124 @@
+import os
+import re
+import threading
+from collections import namedtuple
+
+FLAG_KEYS = ('applied', 'translated', 'proofread', 'published')
+FLAG_RE = re.compile(r'^(applied|translated|proofread|published):\s*(true|false)\b', re.M | re.I)
+FRONT_MATTER_MAX_LINES = 200  # 元信息最多读取的行数，超过视为没有结束分隔线
+
+# 一个源文件的索引项：flags 为元信息中值为 true 的标记，translated 表示 translated/<分类> 下已有同名译文
+SourceEntry = namedtuple('SourceEntry', 'name size mtime flags translated')
+
+# 文件列表的状态筛选
+STATUS_FILTERS = {
+    '全部': lambda entry: True,
+    '未翻译': lambda entry: not entry.translated and 'translated' not in entry.flags,
+    '未申领': lambda entry: 'applied' not in entry.flags,
+    '已有译文': lambda entry: entry.translated,
+    '已翻译': lambda entry: 'translated' in entry.flags,
+    '已校对': lambda entry: 'proofread' in entry.flags,
+}
+FLAG_LABELS = {'applied': '已申领', 'translated': '已翻译', 'proofread': '已校对', 'published': '已发布'}
+
+
+def read_flags(path):
+    """
+    只读取文件开头的元信息，返回值为 true 的状态标记。
+
+    参数:
+    path (str): Markdown 文件路径。
+
+    返回:
+    frozenset: FLAG_KEYS 中值为 true 的标记。
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        if f.readline().strip() != '---':
+            return frozenset()
+        lines = []
+        for _ in range(FRONT_MATTER_MAX_LINES):
+            line = f.readline()
+            if not line or line.strip() == '---':
+                break
+            lines.append(line)
+    return frozenset(key.lower() for key, value in FLAG_RE.findall(''.join(lines)) if value.lower() == 'true')
+
+
+def filter_entries(entries, text='', status='全部'):
+    """按文件名子串（不区分大小写）与状态筛选索引项。"""
+    text = text.strip().lower()
+    accept = STATUS_FILTERS[status]
+    return [entry for entry in entries if accept(entry) and text in entry.name.lower()]
+
+
+def describe(entry):
+    """文件列表中显示的一行：文件名、大小与状态。"""
+    labels = [FLAG_LABELS[key] for key in FLAG_KEYS if key in entry.flags]
+    if entry.translated:
+        labels.append('有译文')
+    return f"{entry.name}  ({entry.size / 1024:.1f} KB)  {' '.join(labels)}".rstrip()
+
+
+class ProjectIndex:
+    """
+    TranslateProject 源文件的内存索引。
+
+    每个分类用 os.scandir 扫描一次 sources/<分类> 与 translated/<分类>，之后的扫描只比较
+    修改时间与大小，只有新增或变化的文件才重新读取元信息，因此可以在后台线程中定期调用
+    scan 监视变化，切换分类时直接使用上次的结果。
+    """
+
+    def __init__(self, project_path):
+        self.project_path = project_path
+        self.entries = {}  # 分类 -> {文件名: SourceEntry}
+        self.lock = threading.Lock()
+
+    def cached(self, category):
+        """返回上次扫描的结果（按文件名排序），尚未扫描时返回 None。"""
+        with self.lock:
+            entries = self.entries.get(category)
+        return None if entries is None else sorted(entries.values())
+
+    def scan(self, category):
+        """
+        重新扫描一个分类，只为新增或修改过的文件读取元信息。目录不存在时视为空。
+
+        返回:
+        list: 按文件名排序的 SourceEntry。
+        """
+        source_dir = os.path.join(self.project_path, "sources", category)
+        translated_dir = os.path.join(self.project_path, "translated", category)
+        translated = {e.name for e in self._scandir(translated_dir)}
+
+        with self.lock:
+            previous = self.entries.get(category, {})
+        current = {}
+        for e in self._scandir(source_dir):
+            try:
+                stat = e.stat()
+                old = previous.get(e.name)
+                if old is not None and old.mtime == stat.st_mtime_ns and old.size == stat.st_size:
+                    flags = old.flags
+                else:
+                    flags = read_flags(e.path)
+            except OSError:
+                continue  # 扫描期间被删除
+            current[e.name] = SourceEntry(e.name, stat.st_size, stat.st_mtime_ns, flags, e.name in translated)
+
+        with self.lock:
+            self.entries[category] = current
+        return sorted(current.values())
+
+    @staticmethod
+    def _scandir(directory):
+        """列出目录中的 Markdown 文件，目录不存在时视为空。"""
+        try:
+            with os.scandir(directory) as it:
+                return [e for e in it if e.name.endswith('.md') and e.is_file()]
+        except FileNotFoundError:
+            return []
+
+    def forget(self, category, name):
+        """从索引中移除一个文件（如在界面中删除后），无需等待下一次扫描。"""
+        with self.lock:
+            self.entries.get(category, {}).pop(name, None)
\ No newline at end of file
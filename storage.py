@@ -0,0 +1,77 @@
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_open(path, mode=None, binary=False):
+    """
+    以原子替换的方式写文件：先写入同目录下的临时文件，正常退出时再替换目标文件。
+
+    写入过程中出错（包括被中断）时删除临时文件并重新抛出异常，目标文件保持不变。
+
+    参数:
+    path (str): 目标文件路径，所在目录不存在时自动创建。
+    mode (int): 文件权限；为 None 时沿用已有目标文件的权限，新文件保持 mkstemp 的 0600。
+    binary (bool): 为 True 时以二进制模式打开，否则以 UTF-8 文本模式打开。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', encoding='utf-8')) as f:
+            yield f
+        if mode is None and os.path.exists(path):
+            mode = os.stat(path).st_mode & 0o7777
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def atomic_write(path, data, mode=None):
+    """原子写入 str（UTF-8）或 bytes，参数见 atomic_open。"""
+    with atomic_open(path, mode, binary=isinstance(data, bytes)) as f:
+        f.write(data)
+
+
+def read_jsonl(path):
+    """
+    逐条产出 JSON Lines 文件中的记录，文件不存在时不产出任何记录。
+
+    跳过空行与中断写入留下的残行。
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def jsonl_line(record):
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def append_jsonl(path, record):
+    """追加一条记录并立即落盘；调用方负责多线程下的加锁。"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(jsonl_line(record))
+
+
+def write_jsonl(path, records, mode=None):
+    """用给定的记录原子替换整个 JSON Lines 文件。"""
+    with atomic_open(path, mode) as f:
+        for record in records:
+            f.write(jsonl_line(record))
\ No newline at end of file
@@ -1,32 +1,87 @@
 import os
-import json
+import time
+import queue
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
-import requests
 import threading
 import logging
-from datetime import datetime
+from collections import deque
+from translator import (CATEGORIES, LOG_PATH, Translator, load_config, save_config,
+                        setup_logging, validate_config)
+from journal import JobJournal
+from planner import SCHEDULES, format_summary
+from project_index import STATUS_FILTERS, ProjectIndex, describe, filter_entries
+
+UI_POLL_MS = 100    # 界面事件队列轮询间隔（毫秒）
+INDEX_POLL_MS = 3000    # 检查当前分类文件变化的间隔（毫秒）
+LOG_BUFFER_LINES = 1000     # 两次刷新之间最多缓存的日志条数，超出时丢弃最旧的
+LOG_WIDGET_LINES = 2000     # 日志窗口最多保留的行数
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+class LogSink(logging.Handler):
+    """
+    日志窗口的缓冲区：任意线程写入，Tk 主线程定时批量取出。
+
+    缓冲区有界，日志产生速度超过界面刷新速度时丢弃最旧的记录并计数，
+    完整日志仍写入日志文件。
+    """
+
+    def __init__(self, capacity=LOG_BUFFER_LINES, level=logging.INFO):
+        super().__init__(level)
+        self.records = deque(maxlen=capacity)
+        self.dropped = 0
+
+    def emit(self, record):
+        try:
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.created))
+            if record.levelno >= logging.ERROR:
+                prefix, tag = '[错误] ', 'error'
+            elif record.levelno >= logging.WARNING:
+                prefix, tag = '[警告] ', 'warning'
+            else:
+                prefix, tag = '', ''
+            text = f"[{stamp}] {prefix}{record.getMessage()}\n"
+        except Exception:
+            self.handleError(record)
+            return
+        with self.lock:
+            if len(self.records) == self.records.maxlen:
+                self.dropped += 1
+            self.records.append((text, tag))
+
+    def drain(self):
+        """取出全部缓存的记录，返回 ([(文本, 标签)], 丢弃条数)。"""
+        with self.lock:
+            records = list(self.records)
+            self.records.clear()
+            dropped, self.dropped = self.dropped, 0
+        return records, dropped
 
 class TranslationApp:
+    """翻译工具的图形界面，翻译流水线由 translator.Translator 完成。"""
+
     def __init__(self, root):
         self.root = root
         self.root.title("FOSSCOPE 翻译工具")
+        self.ui_queue = queue.Queue()
+        self.batch_running = False
+        self.index = None
+        self.index_scanning = False
+        self.entries = []           # 当前分类的全部索引项
+        self.visible_entries = []   # 经过筛选、显示在列表中的索引项，与列表行一一对应
         self.setup_ui()
         self.setup_logging()
-        self.config = {
-            'api_base': "https://api.deepseek.com/v1",
-            'api_key': "",
-            'model': "deepseek-reasoner",
-            'prompt': ""
-        }
+        self.config = load_config()
+        self.translator = Translator(self.config, on_event=self.post_event)
+        self.log_sink.setLevel(self.config['log_level'])
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
+        self.root.after(INDEX_POLL_MS, self.watch_index)
 
     def setup_logging(self):
-        self.logger = logging.getLogger('TranslationTool')
-        self.logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        """在控制台与日志文件之外，增加由主线程批量刷新的日志窗口（级别可在设置中调整）。"""
+        self.logger = setup_logging()
+        self.log_sink = LogSink()
+        self.logger.addHandler(self.log_sink)
 
     def setup_ui(self):
         # 路径设置
@@ -45,12 +100,26 @@ class TranslationApp:
         category_frame.pack(pady=5, fill=tk.X)
         ttk.Label(category_frame, text="分类:").pack(side=tk.LEFT)
         self.category_combo = ttk.Combobox(category_frame, textvariable=self.category_var,
-                                           values=["news", "talk", "tech"], state="readonly")
+                                           values=CATEGORIES, state="readonly")
         self.category_combo.pack(side=tk.LEFT, padx=5)
         self.category_combo.bind("<<ComboboxSelected>>", self.load_files)
 
+        # 筛选
+        ttk.Label(category_frame, text="搜索:").pack(side=tk.LEFT, padx=(10, 0))
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(category_frame, textvariable=self.search_var, width=20)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        search_entry.bind("<KeyRelease>", self.apply_filter)
+        self.status_filter_var = tk.StringVar(value='全部')
+        status_combo = ttk.Combobox(category_frame, textvariable=self.status_filter_var,
+                                    values=list(STATUS_FILTERS), state="readonly", width=8)
+        status_combo.pack(side=tk.LEFT)
+        status_combo.bind("<<ComboboxSelected>>", self.apply_filter)
+        self.count_var = tk.StringVar()
+        ttk.Label(category_frame, textvariable=self.count_var).pack(side=tk.LEFT, padx=10)
+
         # 文件列表
-        self.file_listbox = tk.Listbox(self.root, selectmode=tk.MULTIPLE, width=60, height=15)
+        self.file_listbox = tk.Listbox(self.root, selectmode=tk.MULTIPLE, width=80, height=15)
         self.file_listbox.pack(pady=5, fill=tk.BOTH, expand=True)
 
         # 操作按钮
@@ -59,10 +128,14 @@ class TranslationApp:
         ttk.Button(button_frame, text="翻译选中", command=self.start_translation).pack(side=tk.LEFT)
         ttk.Button(button_frame, text="删除选中", command=self.delete_files).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="设置", command=self.show_settings).pack(side=tk.RIGHT)
+        self.status_var = tk.StringVar(value="就绪")
+        ttk.Label(button_frame, textvariable=self.status_var).pack(side=tk.LEFT, padx=10)
 
         # 日志显示
         self.log_text = scrolledtext.ScrolledText(self.root, height=10)
         self.log_text.pack(pady=5, fill=tk.BOTH, expand=True)
+        self.log_text.tag_config('error', foreground='red')
+        self.log_text.tag_config('warning', foreground='darkorange')
 
     def browse_path(self):
         path = filedialog.askdirectory()
@@ -75,91 +148,143 @@ class TranslationApp:
         if not os.path.exists(os.path.join(self.project_path, "sources")):
             messagebox.showerror("错误", "无效的项目路径")
             return
+        # 在后台为所有分类建立索引，之后切换分类时直接使用
+        self.index = ProjectIndex(self.project_path)
+        self.index_scanning = False
+        self.entries = []
+        self.refresh_index(CATEGORIES)
         self.log("项目加载成功")
+        self.offer_resume()
+
+    def offer_resume(self):
+        """项目有未完成的批量翻译（程序崩溃、网络中断或有失败的文件）时询问是否继续。"""
+        if self.batch_running:
+            return
+        batch = JobJournal(self.config['journal_path']).unfinished(self.project_path)
+        if batch is None:
+            return
+        pending = batch.pending()
+        if not messagebox.askyesno("继续翻译", f"发现未完成的批量翻译（{batch.category}，"
+                                   f"剩余 {len(pending)}/{len(batch.files)} 个文件），是否继续？"):
+            return
+        self.batch_running = True
+        threading.Thread(target=self.translator.resume_batch, args=(self.project_path, batch.category),
+                         daemon=True).start()
 
     def load_files(self, event=None):
         category = self.category_var.get()
-        if not category:
+        if not category or not self.index:
             return
-        source_dir = os.path.join(self.project_path, "sources", category)
-        try:
-            files = [f for f in os.listdir(source_dir) if f.endswith('.md')]
-            self.file_listbox.delete(0, tk.END)
-            for f in files:
-                self.file_listbox.insert(tk.END, f)
-        except Exception as e:
-            self.log_error(f"加载文件失败: {str(e)}")
+        entries = self.index.cached(category)
+        if entries is not None:
+            self.show_entries(entries)
+        self.refresh_index([category])
+
+    def refresh_index(self, categories):
+        """在后台线程中扫描分类，结果通过界面事件队列交给主线程；已有扫描在进行时跳过。"""
+        if self.index_scanning:
+            return
+        self.index_scanning = True
+        index = self.index
+
+        def scan():
+            for category in categories:
+                try:
+                    self.post_event('index', index, category, index.scan(category))
+                except OSError as e:
+                    self.log_error(f"加载文件失败 ({category}): {str(e)}")
+            self.post_event('index_done', index)
+
+        threading.Thread(target=scan, daemon=True).start()
+
+    def watch_index(self):
+        """定期重新扫描当前分类，发现新增、删除或修改的文件后刷新列表。"""
+        category = self.category_var.get()
+        if self.index and category:
+            self.refresh_index([category])
+        self.root.after(INDEX_POLL_MS, self.watch_index)
+
+    def show_entries(self, entries):
+        self.entries = entries
+        self.apply_filter()
+
+    def apply_filter(self, event=None):
+        """按搜索词与状态筛选当前分类，一次性重建列表并尽量保留原有选择。"""
+        selected = {self.visible_entries[i].name for i in self.file_listbox.curselection()}
+        self.visible_entries = filter_entries(self.entries, self.search_var.get(), self.status_filter_var.get())
+        self.file_listbox.delete(0, tk.END)
+        if self.visible_entries:
+            self.file_listbox.insert(tk.END, *map(describe, self.visible_entries))
+        for i, entry in enumerate(self.visible_entries):
+            if entry.name in selected:
+                self.file_listbox.selection_set(i)
+        self.count_var.set(f"{len(self.visible_entries)}/{len(self.entries)} 个文件")
 
     def start_translation(self):
+        if self.batch_running:
+            messagebox.showwarning("警告", "已有翻译任务在进行中")
+            return
         selected = self.file_listbox.curselection()
         if not selected:
             messagebox.showwarning("警告", "请先选择要翻译的文件")
             return
-        files = [self.file_listbox.get(i) for i in selected]
-        threading.Thread(target=self.translate_files, args=(files,), daemon=True).start()
-
-    def translate_files(self, files):
+        files = [self.visible_entries[i].name for i in selected]
+        # Tk 变量只能在主线程读取，分类在启动前确定
         category = self.category_var.get()
-        source_dir = os.path.join(self.project_path, "sources", category)
-        target_dir = os.path.join(self.project_path, "translated", category)
-        os.makedirs(target_dir, exist_ok=True)
+        # 开始前离线估算 token、费用与耗时（需要读取并分块所有文件），在工作线程中进行，
+        # 结果通过 'preflight' 事件交给主线程由用户确认；估算期间不接受新的批次
+        self.batch_running = True
+        self.status_var.set(f"正在估算 {len(files)} 个文件的 token、费用与耗时...")
+        threading.Thread(target=self.run_preflight, args=(self.project_path, category, files), daemon=True).start()
 
-        for file in files:
-            try:
-                self.log(f"开始翻译: {file}")
-                with open(os.path.join(source_dir, file), 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                translated = self.call_translation_api(content)
-                if translated:
-                    translated = self.process_translation(translated)
-                    target_path = os.path.join(target_dir, file)
-                    with open(target_path, 'w', encoding='utf-8') as f:
-                        f.write(translated)
-                    self.log(f"翻译完成: {file}")
-            except Exception as e:
-                self.log_error(f"翻译失败 ({file}): {str(e)}")
-                messagebox.showerror("错误", f"翻译失败: {file}\n错误信息: {str(e)}")
-
-    def call_translation_api(self, content):
-        headers = {
-            "Authorization": f"Bearer {self.config['api_key']}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": self.config['model'],
-            "messages": [
-                {"role": "system", "content": self.config['prompt']},
-                {"role": "user", "content": content}
-            ]
-        }
+    def run_preflight(self, project_path, category, files):
         try:
-            response = requests.post(
-                f"{self.config['api_base']}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-            response.raise_for_status()
+            summary = self.translator.preflight(project_path, category, files)
+        except Exception as e:
+            self.logger.error(f"预估失败: {e}")
+            summary = None
+        self.post_event('preflight', project_path, category, files, summary)
 
-            try:
-                result = response.json()
-                self.log(f"模型响应: {json.dumps(result, ensure_ascii=False)}")
-                return result['choices'][0]['message']['content']
-            except json.JSONDecodeError as e:
-                self.log_error(f"JSON解析失败，响应内容: {response.text}")
-                raise ValueError("无效的API响应格式")
-
-        except requests.exceptions.RequestException as e:
-            self.log_error(f"API请求失败: {str(e)}")
-            raise
-
-    def process_translation(self, text):
-        # 处理元信息替换
-        text = text.replace("{{translator}}", "excniesnied")
-        text = text.replace("applied: false", "applied: true")
-        text = text.replace("translated: false", "translated: true")
-        return text
+    def confirm_translation(self, project_path, category, files, summary):
+        if summary is None or not messagebox.askyesno("确认翻译", f"{format_summary(summary)}。\n\n是否开始翻译？"):
+            self.batch_running = False
+            self.status_var.set("已取消翻译" if summary else "预估失败，详见日志")
+            return
+        threading.Thread(target=self.translator.translate_files, args=(project_path, category, files),
+                         daemon=True).start()
+
+    def post_event(self, kind, *args):
+        """从任意线程投递界面事件，由主线程在 process_ui_queue 中处理。"""
+        self.ui_queue.put((kind, args))
+
+    def process_ui_queue(self):
+        self.flush_log()
+        try:
+            while True:
+                kind, args = self.ui_queue.get_nowait()
+                if kind == 'progress':
+                    done, failed, total, chunks_done, chunks_total = args
+                    self.status_var.set(f"进度: {done + failed}/{total}，失败 {failed}，"
+                                        f"分块 {chunks_done}/{chunks_total}")
+                elif kind == 'preflight':
+                    self.confirm_translation(*args)
+                elif kind == 'finished':
+                    done, failures = args
+                    self.batch_running = False
+                    # 失败的文件汇总在日志中，不弹出对话框，无人值守的批次不会被阻塞
+                    self.status_var.set(f"完成: 成功 {done} 个，失败 {len(failures)} 个"
+                                        + ("（详见日志，重新加载项目可继续）" if failures else ""))
+                    self.load_files()
+                elif kind == 'index':
+                    index, category, entries = args
+                    if index is self.index and category == self.category_var.get() and entries != self.entries:
+                        self.show_entries(entries)
+                elif kind == 'index_done':
+                    if args[0] is self.index:
+                        self.index_scanning = False
+        except queue.Empty:
+            pass
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
 
     def delete_files(self):
         selected = self.file_listbox.curselection()
@@ -170,13 +295,14 @@ class TranslationApp:
         category = self.category_var.get()
         source_dir = os.path.join(self.project_path, "sources", category)
         for i in reversed(selected):
-            file = self.file_listbox.get(i)
+            file = self.visible_entries[i].name
             try:
                 os.remove(os.path.join(source_dir, file))
-                self.file_listbox.delete(i)
+                self.index.forget(category, file)
                 self.log(f"已删除文件: {file}")
             except Exception as e:
                 self.log_error(f"删除失败 ({file}): {str(e)}")
+        self.show_entries(self.index.cached(category))
 
     def show_settings(self):
         settings_win = tk.Toplevel(self.root)
@@ -202,30 +328,117 @@ class TranslationApp:
         prompt_entry.insert(tk.END, self.config['prompt'])
         prompt_entry.grid(row=3, column=1)
 
+        stream_var = tk.BooleanVar(value=self.config['stream'])
+        tm_var = tk.BooleanVar(value=self.config['use_tm'])
+        format_var = tk.BooleanVar(value=self.config['format_output'])
+        validate_var = tk.BooleanVar(value=self.config['validate'])
+        log_level_var = tk.StringVar(value=self.config['log_level'])
+        schedule_var = tk.StringVar(value=self.config['schedule'])
+        int_fields = [
+            ('timeout', "读取超时 (秒):"),
+            ('chunk_chars', "分块大小 (字符):"),
+            ('max_workers', "并发数:"),
+            ('rpm', "每分钟请求数 (0=不限):"),
+            ('tpm', "每分钟 token 数 (0=不限):"),
+            ('max_retries', "最大重试次数:"),
+            ('validate_retries', "检查未通过时重译次数:"),
+        ]
+        int_entries = {}
+        for row, (key, label) in enumerate(int_fields, start=4):
+            ttk.Label(settings_win, text=label).grid(row=row, column=0)
+            entry = ttk.Entry(settings_win, width=40)
+            entry.insert(0, str(self.config[key]))
+            entry.grid(row=row, column=1)
+            int_entries[key] = entry
+        float_fields = [
+            ('price_input', "输入价格 (每百万 token):"),
+            ('price_output', "输出价格 (每百万 token):"),
+        ]
+        float_entries = {}
+        for row, (key, label) in enumerate(float_fields, start=len(int_fields) + 4):
+            ttk.Label(settings_win, text=label).grid(row=row, column=0)
+            entry = ttk.Entry(settings_win, width=40)
+            entry.insert(0, str(self.config[key]))
+            entry.grid(row=row, column=1)
+            float_entries[key] = entry
+
+        stream_row = len(int_fields) + len(float_fields) + 4
+        ttk.Checkbutton(settings_win, text="流式输出", variable=stream_var).grid(row=stream_row, column=1, sticky=tk.W)
+        ttk.Checkbutton(settings_win, text="使用翻译记忆", variable=tm_var).grid(row=stream_row + 1, column=1, sticky=tk.W)
+        ttk.Checkbutton(settings_win, text="整理译文格式", variable=format_var).grid(row=stream_row + 2, column=1, sticky=tk.W)
+        ttk.Checkbutton(settings_win, text="检查译文结构", variable=validate_var).grid(row=stream_row + 3, column=1, sticky=tk.W)
+        ttk.Label(settings_win, text="日志级别:").grid(row=stream_row + 4, column=0)
+        ttk.Combobox(settings_win, textvariable=log_level_var, values=LOG_LEVELS,
+                     state="readonly").grid(row=stream_row + 4, column=1, sticky=tk.W)
+        ttk.Label(settings_win, text="翻译顺序:").grid(row=stream_row + 5, column=0)
+        ttk.Combobox(settings_win, textvariable=schedule_var, values=SCHEDULES,
+                     state="readonly").grid(row=stream_row + 5, column=1, sticky=tk.W)
+
         def save_settings():
+            try:
+                int_values = {key: int(entry.get()) for key, entry in int_entries.items()}
+            except ValueError:
+                messagebox.showerror("错误", "并发与限流设置必须是整数", parent=settings_win)
+                return
+            try:
+                float_values = {key: float(entry.get()) for key, entry in float_entries.items()}
+            except ValueError:
+                messagebox.showerror("错误", "价格必须是数字", parent=settings_win)
+                return
+            try:
+                validate_config(dict(self.config, schedule=schedule_var.get(), **int_values, **float_values))
+            except ValueError as e:
+                messagebox.showerror("错误", str(e), parent=settings_win)
+                return
             self.config.update({
                 'api_base': api_base_entry.get(),
                 'api_key': api_key_entry.get(),
                 'model': model_entry.get(),
-                'prompt': prompt_entry.get("1.0", tk.END).strip()
+                'prompt': prompt_entry.get("1.0", tk.END).strip(),
+                'stream': stream_var.get(),
+                'use_tm': tm_var.get(),
+                'format_output': format_var.get(),
+                'validate': validate_var.get(),
+                'log_level': log_level_var.get(),
+                'schedule': schedule_var.get(),
+                **int_values,
+                **float_values
             })
+            self.log_sink.setLevel(self.config['log_level'])
+            try:
+                save_config(self.config)
+            except OSError as e:
+                self.log_error(f"保存配置文件失败: {e}")
             settings_win.destroy()
             self.log("设置已保存")
 
-        ttk.Button(settings_win, text="保存", command=save_settings).grid(row=4, column=1, pady=5)
+        ttk.Button(settings_win, text="保存", command=save_settings).grid(row=stream_row + 6, column=1, pady=5)
 
     def log(self, message):
-        timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-        self.log_text.insert(tk.END, f"{timestamp} {message}\n")
-        self.log_text.see(tk.END)
         self.logger.info(message)
 
+    def log_warning(self, message):
+        self.logger.warning(message)
+
     def log_error(self, message):
-        timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-        self.log_text.insert(tk.END, f"{timestamp} [错误] {message}\n", 'error')
-        self.log_text.see(tk.END)
         self.logger.error(message)
 
+    def flush_log(self):
+        """把缓冲区中的日志一次性插入日志窗口，并裁剪到 LOG_WIDGET_LINES 行。"""
+        records, dropped = self.log_sink.drain()
+        if not records:
+            return
+        chunks = []
+        if dropped:
+            chunks += [f"... 日志过多，省略 {dropped} 条（完整日志见 {LOG_PATH}）\n", 'error']
+        for text, tag in records:
+            chunks += [text, tag]
+        self.log_text.insert(tk.END, *chunks)
+        lines = int(self.log_text.index('end-1c').split('.')[0])
+        if lines > LOG_WIDGET_LINES:
+            self.log_text.delete('1.0', f"{lines - LOG_WIDGET_LINES + 1}.0")
+        self.log_text.see(tk.END)
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = TranslationApp(root)
@@ -0,0 +1,96 @@
+import os
+import time
+import sqlite3
+import pathlib
+import hashlib
+
+TM_PATH = os.path.join(os.path.expanduser('~'), '.fosscope', 'translation_memory.sqlite3')
+
+
+def normalize_segment(text):
+    """归一化分块文本：统一换行并压缩空白，使仅空白不同的分块命中同一条记录。"""
+    lines = text.replace('\r\n', '\n').strip().split('\n')
+    return '\n'.join(' '.join(line.split()) for line in lines)
+
+
+def fingerprint(model, prompt):
+    """模型与提示词的指纹，任一变化都会使已有译文失效。"""
+    return hashlib.sha256(f"{model}\0{prompt}".encode('utf-8')).hexdigest()[:16]
+
+
+class TranslationMemory:
+    """
+    以 SQLite 保存的分块翻译记忆。
+
+    键为 (模型+提示词指纹, 归一化分块文本) 的 SHA-256，值为模型译文。
+    同一实例只应在一个线程中使用。
+
+    readonly 为 True 时（翻译前的预估与试运行）只查询：不创建数据库文件，
+    不写入译文，也不更新各条记录的命中次数。
+    """
+
+    def __init__(self, path=TM_PATH, readonly=False):
+        self.readonly = readonly
+        self.hits = 0
+        self.misses = 0
+        if readonly:
+            self.conn = None
+            if os.path.exists(path):
+                self.conn = sqlite3.connect(pathlib.Path(os.path.abspath(path)).as_uri() + '?mode=ro', uri=True)
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " key TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " target TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _key(text, fp):
+        return hashlib.sha256(f"{fp}\0{normalize_segment(text)}".encode('utf-8')).hexdigest()
+
+    def get(self, text, fp):
+        """查询译文，未命中返回 None，并累计命中率统计。"""
+        key = self._key(text, fp)
+        row = None
+        if self.conn:
+            try:
+                row = self.conn.execute("SELECT target FROM segments WHERE key = ?", (key,)).fetchone()
+            except sqlite3.OperationalError:
+                if not self.readonly:
+                    raise  # 只读时数据库可能尚未建表
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.readonly:
+            return row[0]
+        self.conn.execute("UPDATE segments SET hits = hits + 1 WHERE key = ?", (key,))
+        self.conn.commit()
+        return row[0]
+
+    def put(self, text, fp, translation):
+        if self.readonly:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO segments (key, fingerprint, source, target, created_at) VALUES (?, ?, ?, ?, ?)",
+            (self._key(text, fp), fp, normalize_segment(text), translation, time.time())
+        )
+        self.conn.commit()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
\ No newline at end of file
@@ -0,0 +1,819 @@
+"""
+翻译流水线核心：文件发现、分块、调用模型 API、写入译文，以及无界面的命令行入口。
+
+不依赖 tkinter，可在无图形界面的服务器上运行；translate.py 中的图形界面是它的一个客户端。
+
+    python translator.py /path/to/TranslateProject -c news '2025*.md' -j 4
+    python translator.py /path/to/TranslateProject -c tech --dry-run
+"""
+import os
+import sys
+import json
+import time
+import random
+import fnmatch
+import argparse
+import threading
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from logging.handlers import RotatingFileHandler
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from format_fix import format_text
+from journal import DONE, FAILED, JOURNAL_PATH, RUNNING, JobJournal
+from metrics import Metrics, add_arguments as add_metrics_arguments, from_args as metrics_from_args
+from md_chunker import CHUNK_CHARS, chunk_markdown, split_front_matter, split_padding
+from planner import SCHEDULES, Calibration, format_summary, order_plans, plan_job, summarize
+from storage import atomic_write
+from translation_memory import TM_PATH, TranslationMemory, fingerprint
+from validator import validate_chunk, validate_file
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+BACKOFF_BASE = 2    # 退避基数（秒）
+BACKOFF_MAX = 60    # 单次退避上限（秒）
+CONNECT_TIMEOUT = 10        # 连接超时（秒）
+STREAM_LOG_INTERVAL = 5     # 流式进度日志间隔（秒）
+LOG_PATH = os.path.join(os.path.expanduser('~'), '.fosscope', 'logs', 'translate.log')
+LOG_FILE_BYTES = 5 * 1024 * 1024    # 单个日志文件大小上限，超过后轮转
+LOG_FILE_BACKUPS = 3                # 保留的历史日志文件数
+CONFIG_PATH = os.path.join(os.path.expanduser('~'), '.fosscope', 'translate.json')
+API_KEY_ENV = 'FOSSCOPE_API_KEY'    # 未在配置中填写 API 密钥时从该环境变量读取
+CATEGORIES = ('news', 'talk', 'tech')
+
+DEFAULT_CONFIG = {
+    'api_base': "https://api.deepseek.com/v1",
+    'api_key': "",
+    'model': "deepseek-reasoner",
+    'prompt': "",
+    'max_workers': 3,   # 同时进行的翻译请求数
+    'rpm': 0,           # 每分钟请求数上限，0 表示不限
+    'tpm': 0,           # 每分钟 token 数上限，0 表示不限
+    'max_retries': 3,   # 429/5xx/网络错误的最大重试次数
+    'stream': True,     # 使用 SSE 流式输出
+    'timeout': 300,     # 读取超时（秒），流式模式下为两次数据之间的最长间隔
+    'chunk_chars': CHUNK_CHARS,  # 翻译分块的目标字符数
+    'use_tm': True,     # 复用翻译记忆中的分块译文
+    'format_output': False,  # 写入前用 format_fix 整理译文的行首空格与空行
+    'log_level': 'INFO',     # 日志窗口显示的最低级别，日志文件始终记录全部级别
+    'schedule': 'sjf',  # 批量翻译的顺序：sjf（预计 token 少的先翻译）、priority、none
+    'price_input': 0.0,     # 输入每百万 token 的价格，用于估算费用，0 表示不估算
+    'price_output': 0.0,    # 输出每百万 token 的价格
+    'validate': True,       # 检查译文结构（标签、标题、链接、代码块、元信息），不通过的分块重新翻译
+    'validate_retries': 2,  # 分块未通过检查时重新翻译的次数
+    'tm_path': TM_PATH,
+    'journal_path': JOURNAL_PATH
+}
+
+logger = logging.getLogger('TranslationTool')
+
+class TruncatedOutput(ValueError):
+    """模型输出因长度上限被截断 (finish_reason=length)。"""
+
+class IncompleteStream(ValueError):
+    """流式响应在给出 finish_reason 之前结束（如代理或服务器中途正常关闭连接），按网络错误重试。"""
+
+def backoff_delay(attempt):
+    """带完全抖动的指数退避。"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def retry_after_seconds(response):
+    """解析 Retry-After 响应头（秒数形式），无法解析时返回 None。"""
+    value = response.headers.get('Retry-After')
+    try:
+        return min(BACKOFF_MAX, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return None
+
+def setup_logging():
+    """
+    为 TranslationTool 日志配置控制台（INFO 及以上）与轮转的日志文件（全部级别，
+    包括完整的模型响应）输出。重复调用不会重复添加处理器。
+    """
+    if logger.handlers:
+        return logger
+    logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    handler = logging.StreamHandler()
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+    try:
+        os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+        file_handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_FILE_BYTES, backupCount=LOG_FILE_BACKUPS,
+                                           encoding='utf-8', delay=True)
+    except OSError as e:
+        logger.warning(f"无法创建日志文件 {LOG_PATH}: {e}")
+    else:
+        file_handler.setFormatter(formatter)
+        logger.addHandler(file_handler)
+    return logger
+
+def load_config(path=CONFIG_PATH):
+    """读取保存的配置并与默认配置合并，文件不存在或损坏时返回默认配置。"""
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        saved = {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取配置文件 {path}: {e}")
+        saved = {}
+    config.update({key: value for key, value in saved.items() if key in DEFAULT_CONFIG})
+    return config
+
+def save_config(config, path=CONFIG_PATH):
+    """原子写入配置文件。文件中包含 API 密钥，权限设为仅当前用户可读写。"""
+    atomic_write(path, json.dumps({key: config[key] for key in DEFAULT_CONFIG}, ensure_ascii=False, indent=2), 0o600)
+
+def validate_config(config):
+    """检查数值设置，不合法时抛出 ValueError。"""
+    int_keys = ('timeout', 'chunk_chars', 'max_workers', 'rpm', 'tpm', 'max_retries', 'validate_retries')
+    if any(not isinstance(config[key], int) for key in int_keys):
+        raise ValueError("并发与限流设置必须是整数")
+    if config['max_workers'] < 1 or config['timeout'] < 1 or config['chunk_chars'] < 500 \
+            or min(config[key] for key in int_keys) < 0:
+        raise ValueError("并发数与超时至少为 1，分块大小至少为 500，其他数值不能为负")
+    if any(not isinstance(config[key], (int, float)) or config[key] < 0 for key in ('price_input', 'price_output')):
+        raise ValueError("价格必须是非负数")
+    if config['schedule'] not in SCHEDULES:
+        raise ValueError(f"调度策略必须是 {'、'.join(SCHEDULES)} 之一")
+
+def list_sources(project_path, category, patterns=None):
+    """
+    列出 sources/<category> 下的 Markdown 文件名。
+
+    参数:
+    project_path (str): TranslateProject 的路径。
+    category (str): 分类（news、talk、tech）。
+    patterns (list): 文件名通配符，如 ['2025*.md']，缺省为全部 .md 文件。
+
+    返回:
+    list: 按名称排序的文件名。
+    """
+    source_dir = os.path.join(project_path, "sources", category)
+    files = sorted(f for f in os.listdir(source_dir) if f.endswith('.md'))
+    if patterns:
+        files = [f for f in files if any(fnmatch.fnmatch(f, pattern) for pattern in patterns)]
+    return files
+
+class RateLimiter:
+    """按 60 秒滑动窗口限制每分钟请求数 (RPM) 与 token 数 (TPM)，0 表示不限。"""
+
+    def __init__(self, rpm=0, tpm=0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = deque()  # (时间戳, token 数)
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        """阻塞直到本次请求可以发出，并计入窗口。"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.window and now - self.window[0][0] >= 60:
+                    self.window.popleft()
+                used_tokens = sum(t for _, t in self.window)
+                rpm_ok = not self.rpm or len(self.window) < self.rpm
+                # 单个请求超过 TPM 上限时，窗口清空后仍然放行，避免永久阻塞
+                tpm_ok = not self.tpm or used_tokens + tokens <= self.tpm or not self.window
+                if rpm_ok and tpm_ok:
+                    self.window.append((now, tokens))
+                    return
+                wait = 60 - (now - self.window[0][0])
+            time.sleep(max(wait, 0.05))
+
+class TranslationJob:
+    """
+    一篇文章的分块翻译状态。
+
+    元信息不送入模型，代码块原样保留，其余分块并行翻译后按原顺序拼接。
+    """
+
+    def __init__(self, file, content, chunk_chars=CHUNK_CHARS):
+        self.file = file
+        self.content = content
+        self.front_matter, body = split_front_matter(content)
+        self.segments = chunk_markdown(body, chunk_chars)
+        self.pending = [i for i, seg in enumerate(self.segments) if seg.kind == 'text' and seg.text.strip()]
+        self.results = {}
+        self.futures = []
+        self.failed = False
+
+    def source(self, index):
+        """分块去掉首尾空白后的原文，即实际送入模型的内容。"""
+        return split_padding(self.segments[index].text)[1]
+
+    @property
+    def complete(self):
+        return len(self.results) == len(self.pending)
+
+    def assemble(self, partial=False):
+        """按原顺序拼接译文；partial 为 True 时拼接到第一个未完成的分块为止。"""
+        parts = [self.front_matter]
+        for index, segment in enumerate(self.segments):
+            if index in self.results:
+                lead, _, trail = split_padding(segment.text)
+                parts.append(lead + self.results[index].strip() + trail)
+            elif segment.kind == 'code' or not segment.text.strip():
+                parts.append(segment.text)
+            elif partial:
+                break
+            else:
+                raise ValueError(f"分块 {index} 尚未翻译")
+        return ''.join(parts)
+
+class Translator:
+    """
+    无界面的翻译流水线。
+
+    参数:
+    config (dict): 配置，键同 DEFAULT_CONFIG。
+    on_event (callable): 可选的进度回调 on_event(kind, *args)，在调度线程中调用：
+        'progress' (成功数, 失败数, 文件总数, 已完成分块数, 分块总数)；
+        'finished' (成功数, [(文件名, 错误信息)])。
+    metrics (Metrics): 可选，记录每次 API 请求的延迟、首个 token 用时、token 数与重试次数，
+        以及各阶段耗时与翻译记忆命中数；每个批次开始时清零，结束时在日志中输出汇总表。
+    """
+
+    def __init__(self, config=None, on_event=None, metrics=None):
+        self.config = config if config is not None else dict(DEFAULT_CONFIG)
+        self.on_event = on_event or (lambda kind, *args: None)
+        self.metrics = metrics or Metrics(enabled=False)
+        self.logger = logger
+        self.session = requests.Session()
+        self._pool_size = None
+        self._resize_pool()
+        self.calibration = Calibration(self.config['model'])
+
+    def _resize_pool(self):
+        """按并发数调整连接池大小，使每个工作线程都能复用连接；图形界面中修改并发数后在下一个批次生效。"""
+        size = max(1, self.config['max_workers'])
+        if size == self._pool_size:
+            return
+        old = self.session.adapters.get('https://')
+        adapter = HTTPAdapter(pool_maxsize=size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if old is not None:
+            old.close()
+        self._pool_size = size
+
+    def prepare(self, source_dir, files, tm=None, journal=None, batch=None):
+        """
+        读取文章并分块，从任务日志（继续批次时）与翻译记忆中填入已有译文，
+        估算其余分块的 token，按调度策略排序。
+
+        返回:
+        tuple: (FilePlan 列表, [(文件名, 错误)], 翻译记忆节省的 token 数)。
+        """
+        self.calibration = Calibration(self.config['model'])
+        tm_fp = fingerprint(self.config['model'], self.config['prompt'])
+        plans = []
+        errors = []
+        saved_tokens = 0
+        for file in files:
+            try:
+                with open(os.path.join(source_dir, file), 'r', encoding='utf-8') as f:
+                    job = TranslationJob(file, f.read(), self.config['chunk_chars'])
+                for index in job.pending:
+                    translation = journal.chunk(batch, file, index, job.source(index)) if journal else None
+                    if translation is None and tm:
+                        translation = tm.get(job.source(index), tm_fp)
+                    if translation is not None and self.config['validate'] \
+                            and validate_chunk(job.source(index), translation):
+                        translation = None  # 已有译文未通过检查（如早先保存的截断译文），重新翻译
+                    if translation is not None:
+                        job.results[index] = translation
+                        saved_tokens += sum(self.calibration.estimate(self.config['prompt'], job.source(index)))
+                plans.append(plan_job(job, self.config['prompt'], self.calibration))
+            except Exception as e:
+                errors.append((file, e))
+        return order_plans(plans, self.config['schedule']), errors, saved_tokens
+
+    def preflight(self, project_path, category, files):
+        """不调用 API，估算一批文件的 token、费用与耗时，返回 summarize 的结果。"""
+        tm = TranslationMemory(self.config['tm_path'], readonly=True) if self.config['use_tm'] else None
+        try:
+            plans, _, _ = self.prepare(os.path.join(project_path, "sources", category), files, tm)
+        finally:
+            if tm:
+                tm.close()
+        return summarize(plans, self.config, self.calibration)
+
+    def resume_batch(self, project_path, category=None, dry_run=False):
+        """
+        继续该项目最近一个未结束的批次：跳过已成功的文件，复用已完成的分块，
+        重新翻译中断或失败的文件。dry_run 为 True 时只统计剩余的分块与 token，见 translate_files。
+
+        返回:
+        tuple: 同 translate_files；没有未结束的批次时为 (0, [])。
+        """
+        try:
+            journal = JobJournal(self.config['journal_path'])
+            batch = journal.unfinished(project_path, category)
+        except Exception as e:
+            self.log_error(f"无法读取任务日志: {e.__class__.__name__}: {e}")
+            failures = [('（批次）', str(e))]
+            self.on_event('finished', 0, failures)
+            return 0, failures
+        if batch is None:
+            self.log("没有未完成的批量翻译")
+            self.on_event('finished', 0, [])
+            return 0, []
+        files = batch.pending()
+        self.log(f"继续批次 {batch.id}: {len(batch.files) - len(files)} 个文件已完成，剩余 {len(files)} 个")
+        return self.translate_files(batch.project, batch.category, files, dry_run, journal, batch)
+
+    def translate_files(self, project_path, category, files, dry_run=False, journal=None, batch=None):
+        """
+        调度线程：把每篇文章拆成分块，所有分块共用一个线程池并行翻译，
+        某篇文章的分块全部完成后按原顺序拼接写入，并汇总进度与失败信息。
+
+        参数:
+        project_path (str): TranslateProject 的路径，源文件在 sources/<category>，译文写入 translated/<category>。
+        category (str): 分类。
+        files (list): sources/<category> 下的文件名。
+        dry_run (bool): 只统计分块数、翻译记忆命中数与预计 token 数，不调用 API、不写文件。
+        journal, batch: 由 resume_batch 传入的任务日志与要继续的批次；缺省时登记一个新批次。
+
+        返回:
+        tuple: (成功数, [(文件名, 错误信息)])。
+        """
+        done = 0
+        failures = []
+        tm = None
+        try:
+            source_dir = os.path.join(project_path, "sources", category)
+            target_dir = os.path.join(project_path, "translated", category)
+            if not dry_run:
+                os.makedirs(target_dir, exist_ok=True)
+                if journal is None:
+                    journal = JobJournal(self.config['journal_path'])
+                    journal.compact()
+                    batch = journal.start_batch(project_path, category, files)
+
+            limiter = RateLimiter(self.config['rpm'], self.config['tpm'])
+            tm = TranslationMemory(self.config['tm_path'], readonly=dry_run) if self.config['use_tm'] else None
+            tm_fp = fingerprint(self.config['model'], self.config['prompt'])
+            total = len(files)
+            chunks_done = 0
+            chunks_total = 0
+
+            def fail(job_file, error):
+                failures.append((job_file, str(error)))
+                self.log_error(f"翻译失败 ({job_file}): {str(error)}")
+                if journal:
+                    journal.set_state(batch, job_file, FAILED, error=str(error))
+
+            def succeed(job):
+                self.finish_job(job, target_dir)
+                if journal:
+                    journal.set_state(batch, job.file, DONE)
+
+            self.metrics.reset()
+            with self.metrics('prepare'):
+                plans, errors, saved_tokens = self.prepare(source_dir, files, tm, journal, batch)
+            for file, error in errors:
+                fail(file, error)
+            summary = summarize(plans, self.config, self.calibration)
+            self.log(f"{'[试运行] ' if dry_run else ''}预估: {format_summary(summary)}")
+
+            self._resize_pool()
+            with ThreadPoolExecutor(max_workers=max(1, self.config['max_workers'])) as executor:
+                futures = {}
+                retries = {}  # (文件名, 分块序号) -> 因未通过检查而重新翻译的次数
+
+                def submit(job, index, label):
+                    meta = {}
+                    future = executor.submit(self.call_translation_api, job.source(index), limiter, label=label, meta=meta)
+                    futures[future] = (job, index, label, meta)
+                    job.futures.append(future)
+                    return future
+
+                for plan in plans:
+                    job = plan.job
+                    if dry_run:
+                        priority = f"，优先级 {plan.priority}" if plan.priority else ''
+                        self.log(f"[试运行] {job.file}: {len(job.pending)} 个分块，翻译记忆命中 {plan.cached} 个，"
+                                 f"预计输入 {plan.input_tokens} / 输出 {plan.output_tokens} 个 token{priority}")
+                        done += 1
+                        continue
+                    try:
+                        self.log(f"开始翻译: {job.file} ({len(job.pending)} 个分块，已有译文 {plan.cached} 个)")
+                        journal.set_state(batch, job.file, RUNNING)
+                        if job.complete:
+                            succeed(job)
+                            done += 1
+                            continue
+                    except Exception as e:
+                        fail(job.file, e)
+                        continue
+                    misses = [index for index in job.pending if index not in job.results]
+                    chunks_total += len(misses)
+                    for n, index in enumerate(misses, start=1):
+                        submit(job, index, f"{job.file} [{n}/{len(misses)}]")
+                self.on_event('progress', done, len(failures), total, chunks_done, chunks_total)
+
+                # 未通过检查的分块会重新提交，因此不能用 as_completed 遍历固定的集合
+                running = set(futures)
+                while running:
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        job, index, label, meta = futures[future]
+                        if job.failed:
+                            continue
+                        chunks_done += 1
+                        try:
+                            translated = future.result()
+                            if not translated:
+                                raise ValueError("模型返回内容为空")
+                            with self.metrics('validate'):
+                                problems = validate_chunk(job.source(index), translated) if self.config['validate'] else []
+                            if problems:
+                                attempt = retries.get((job.file, index), 0)
+                                if attempt >= self.config['validate_retries']:
+                                    raise ValueError(f"分块 {label} 未通过检查: {'；'.join(problems)}")
+                                retries[(job.file, index)] = attempt + 1
+                                self.metrics.count('validate:retries')
+                                self.log_warning(f"{label} 未通过检查，重新翻译该分块 "
+                                                 f"({attempt + 1}/{self.config['validate_retries']}): {'；'.join(problems)}")
+                                running.add(submit(job, index, label))
+                                chunks_total += 1
+                                continue
+                            job.results[index] = translated
+                            journal.record_chunk(batch, job.file, index, job.source(index), translated,
+                                                 meta.get('request_id'), meta.get('attempts', 1))
+                            if tm:
+                                tm.put(job.source(index), tm_fp, translated)
+                            if job.complete:
+                                succeed(job)
+                                done += 1
+                            else:
+                                self.write_partial(job, target_dir)
+                        except Exception as e:
+                            job.failed = True
+                            for other in job.futures:
+                                other.cancel()
+                            fail(job.file, e)
+                        self.on_event('progress', done, len(failures), total, chunks_done, chunks_total)
+
+            if not dry_run:
+                self.log(f"批量翻译结束: 成功 {done} 个，失败 {len(failures)} 个")
+                if batch.pending():
+                    self.log_warning(f"批次 {batch.id} 还有 {len(batch.pending())} 个文件未完成，"
+                                     f"可在图形界面重新加载项目或使用 --resume 继续")
+                else:
+                    journal.finish_batch(batch)
+                try:
+                    self.calibration.save()
+                except OSError as e:
+                    self.log_warning(f"无法保存 token 校准数据: {e}")
+            if tm:
+                self.log(f"翻译记忆: 命中 {tm.hits}/{tm.hits + tm.misses} 个分块 ({tm.hit_rate:.0%})，"
+                         f"约节省 {saved_tokens} 个 token")
+                self.metrics.count('tm:hit', tm.hits)
+                self.metrics.count('tm:miss', tm.misses)
+                tm.close()
+            if self.metrics.enabled and not dry_run:
+                self.metrics.event('batch', project=project_path, category=category, files=total, done=done,
+                                   failed=len(failures))
+                self.log("耗时统计:\n" + self.metrics.summary())
+        except Exception as e:
+            # 打开任务日志、翻译记忆或读取文件时出错：记为失败并照常发出 'finished'，
+            # 界面不会一直停留在“已有翻译任务在进行中”
+            failures.append(('（批次）', str(e)))
+            self.log_error(f"批量翻译中止: {e.__class__.__name__}: {e}")
+            if tm:
+                tm.close()
+        finally:
+            if failures:
+                self.log_error(f"失败的文件 ({len(failures)} 个):")
+            for file, error in failures:
+                self.log_error(f"  {file}: {error}")
+            self.on_event('finished', done, failures)
+        return done, failures
+
+    def finish_job(self, job, target_dir):
+        target_path = os.path.join(target_dir, job.file)
+        translated = self.process_translation(job.assemble())
+        if self.config['validate']:
+            with self.metrics('validate'):
+                problems = validate_file(job.content, translated)
+            if problems:
+                raise ValueError(f"译文未通过检查: {'；'.join(problems)}")
+        if self.config['format_output']:
+            with self.metrics('format'):
+                translated = format_text(translated)
+        with self.metrics('write'):
+            with open(target_path, 'w', encoding='utf-8') as f:
+                f.write(translated)
+        if os.path.exists(target_path + '.partial'):
+            os.remove(target_path + '.partial')
+        self.log(f"翻译完成: {job.file}")
+
+    def write_partial(self, job, target_dir):
+        """把已按顺序完成的分块写入 .partial 文件，中断或失败时可据此检查进度。"""
+        with open(os.path.join(target_dir, job.file + '.partial'), 'w', encoding='utf-8') as f:
+            f.write(job.assemble(partial=True))
+
+    def call_translation_api(self, content, limiter=None, label='', meta=None):
+        """
+        调用 chat/completions 接口翻译 content，返回模型输出文本。
+
+        参数:
+        content (str): 要翻译的文本。
+        limiter (RateLimiter): 可选的限流器。
+        label (str): 日志中用于标识本次请求的名称。
+        meta (dict): 可选，返回前写入 request_id（服务端的请求 ID）、attempts（请求次数）
+                     与 ttft（流式响应的首个 token 用时，秒）。
+
+        输出因 finish_reason=length 被截断时抛出 TruncatedOutput。
+        """
+        headers = {
+            "Authorization": f"Bearer {self.config['api_key'] or os.environ.get(API_KEY_ENV, '')}",
+            "Content-Type": "application/json"
+        }
+        stream = self.config['stream']
+        data = {
+            "model": self.config['model'],
+            "messages": [
+                {"role": "system", "content": self.config['prompt']},
+                {"role": "user", "content": content}
+            ],
+            "stream": stream
+        }
+        if stream:
+            # 流式响应默认不带 usage，需显式请求，才能在最后一个数据块中拿到 token 数用于校准与统计
+            data["stream_options"] = {"include_usage": True}
+        # 按校准后的估算值计入 TPM 窗口
+        tokens = sum(self.calibration.estimate(self.config['prompt'], content))
+        max_retries = self.config['max_retries']
+        # 流式模式下读取超时是两个数据块之间的最长间隔，而不是整个响应的耗时
+        timeout = (CONNECT_TIMEOUT, self.config['timeout'])
+        meta = meta if meta is not None else {}
+        requested = time.monotonic()
+        try:
+            for attempt in range(max_retries + 1):
+                if limiter:
+                    waiting = time.monotonic()
+                    limiter.acquire(tokens)
+                    self.metrics.observe('api:wait', time.monotonic() - waiting)
+                start = time.monotonic()
+                try:
+                    response = self.session.post(
+                        f"{self.config['api_base']}/chat/completions",
+                        headers=headers,
+                        json=data,
+                        timeout=timeout,
+                        stream=stream
+                    )
+                    if response.status_code in RETRY_STATUS and attempt < max_retries:
+                        response.close()
+                        delay = retry_after_seconds(response) or backoff_delay(attempt)
+                        self.log_warning(f"API 返回 {response.status_code}，{delay:.1f} 秒后重试 ({attempt + 1}/{max_retries})")
+                        time.sleep(delay)
+                        continue
+                    response.raise_for_status()
+                    if stream:
+                        text, finish_reason, usage, response_id = self.read_stream(response, label, meta)
+                    else:
+                        text, finish_reason, usage, response_id = self.read_response(response)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                        requests.exceptions.ChunkedEncodingError, IncompleteStream) as e:
+                    if attempt == max_retries:
+                        raise
+                    delay = backoff_delay(attempt)
+                    self.log_warning(f"请求异常 ({e.__class__.__name__})，{delay:.1f} 秒后重试 ({attempt + 1}/{max_retries})")
+                    time.sleep(delay)
+                    continue
+                break
+
+        except requests.exceptions.RequestException as e:
+            self.log_error(f"API请求失败: {str(e)}")
+            self.metrics.count('api:errors')
+            self.metrics.event('request', label=label, status='failed', seconds=round(time.monotonic() - requested, 3),
+                               error=f"{e.__class__.__name__}: {e}")
+            raise
+
+        meta['request_id'] = response.headers.get('x-request-id') or response_id
+        meta['attempts'] = attempt + 1
+        latency = time.monotonic() - start
+        if usage:
+            self.calibration.record(self.config['prompt'], content, usage, latency)
+        self.record_request(label, meta, latency, time.monotonic() - requested, finish_reason, usage)
+        if finish_reason == 'length':
+            raise TruncatedOutput(f"模型输出被截断 (finish_reason=length)，已输出 {len(text)} 个字符")
+        return text
+
+    def read_response(self, response):
+        """解析非流式响应，返回 (文本, finish_reason, usage, 响应 ID)。"""
+        try:
+            result = response.json()
+            self.logger.debug(f"模型响应: {json.dumps(result, ensure_ascii=False)}")
+            choice = result['choices'][0]
+            text = choice['message']['content']
+        except json.JSONDecodeError as e:
+            self.log_error(f"JSON解析失败，响应内容: {response.text[:200]}")
+            self.logger.debug(f"无法解析的响应: {response.text}")
+            raise ValueError("无效的API响应格式")
+        return text, choice.get('finish_reason'), result.get('usage'), result.get('id')
+
+    def record_request(self, label, meta, latency, total, finish_reason, usage):
+        """
+        记录一次成功的 API 请求：latency 为最后一次尝试的耗时，total 含限流等待与重试。
+        """
+        usage = usage or {}
+        self.metrics.observe('api', total)
+        self.metrics.observe('api:latency', latency)
+        if 'ttft' in meta:
+            self.metrics.observe('api:ttft', meta['ttft'])
+        self.metrics.count('api:requests')
+        self.metrics.count('api:retries', meta['attempts'] - 1)
+        self.metrics.count('tokens:prompt', usage.get('prompt_tokens', 0))
+        self.metrics.count('tokens:completion', usage.get('completion_tokens', 0))
+        self.metrics.event('request', label=label, status='ok', request_id=meta['request_id'],
+                           attempts=meta['attempts'], seconds=round(total, 3), latency=round(latency, 3),
+                           ttft=round(meta['ttft'], 3) if 'ttft' in meta else None, finish_reason=finish_reason,
+                           prompt_tokens=usage.get('prompt_tokens'), completion_tokens=usage.get('completion_tokens'))
+
+    def read_stream(self, response, label='', meta=None):
+        """
+        逐行解析 SSE 流，返回 (文本, finish_reason, usage, 响应 ID)。
+
+        每隔 STREAM_LOG_INTERVAL 秒在日志中报告已接收的字符数与 token 速率；
+        传入 meta 时写入首个 token 用时 ttft（秒）。
+        """
+        parts = []
+        finish_reason = None
+        usage = None
+        response_id = None
+        deltas = 0
+        reasoning = 0
+        start = time.monotonic()
+        first_token = None
+        last_report = start
+        for raw_line in response.iter_lines():
+            # 空行为事件分隔，以冒号开头的是注释/心跳
+            if not raw_line or raw_line.startswith(b':'):
+                continue
+            line = raw_line.decode('utf-8')
+            if not line.startswith('data:'):
+                continue
+            payload = line[5:].strip()
+            if payload == '[DONE]':
+                break
+            try:
+                event = json.loads(payload)
+            except json.JSONDecodeError:
+                self.log_error(f"无法解析的流式数据: {payload[:200]}")
+                continue
+            usage = event.get('usage') or usage
+            response_id = response_id or event.get('id')
+            for choice in event.get('choices') or ():
+                delta = choice.get('delta') or {}
+                if delta.get('reasoning_content'):
+                    reasoning += 1
+                piece = delta.get('content')
+                if piece:
+                    if first_token is None:
+                        first_token = time.monotonic()
+                        self.log(f"{label} 首个 token 用时 {first_token - start:.1f} 秒")
+                        if meta is not None:
+                            meta['ttft'] = first_token - start
+                    parts.append(piece)
+                    deltas += 1
+                finish_reason = choice.get('finish_reason') or finish_reason
+
+            now = time.monotonic()
+            if now - last_report >= STREAM_LOG_INTERVAL:
+                last_report = now
+                if first_token is None:
+                    self.log(f"{label} 模型思考中... ({reasoning} 个推理片段, {now - start:.0f} 秒)")
+                else:
+                    # 流式响应中途没有 usage，这里是内容片段（delta 事件）的速率，与 token 数不完全相同
+                    rate = deltas / max(now - first_token, 1e-6)
+                    self.log(f"{label} 已接收 {sum(map(len, parts))} 个字符, {rate:.1f} 片段/秒")
+
+        text = ''.join(parts)
+        elapsed = time.monotonic() - start
+        if finish_reason is None:
+            raise IncompleteStream(f"流式响应在 finish_reason 之前结束，已接收 {len(text)} 个字符")
+        if usage and usage.get('completion_tokens'):
+            tokens = usage['completion_tokens']
+            received = f"{tokens} tokens ({tokens / max(elapsed, 1e-6):.1f} tok/s)"
+        else:
+            received = f"{deltas} 个片段"
+        self.log(f"{label} 流式响应结束: finish_reason={finish_reason}, {received}, 用时 {elapsed:.1f} 秒")
+        return text, finish_reason, usage, response_id
+
+    def process_translation(self, text):
+        # 处理元信息替换
+        text = text.replace("{{translator}}", "excniesnied")
+        text = text.replace("applied: false", "applied: true")
+        text = text.replace("translated: false", "translated: true")
+        return text
+
+    def log(self, message):
+        self.logger.info(message)
+
+    def log_warning(self, message):
+        self.logger.warning(message)
+
+    def log_error(self, message):
+        self.logger.error(message)
+
+def main():
+    parser = argparse.ArgumentParser(description='FOSSCOPE 翻译工具（命令行）')
+    parser.add_argument('project', help='TranslateProject 的路径')
+    parser.add_argument('patterns', nargs='*', help="sources/<分类> 下的文件名通配符，如 '2025*.md'（默认: 全部）")
+    parser.add_argument('-c', '--category', required=True, choices=CATEGORIES, help='分类')
+    parser.add_argument('-j', '--workers', type=int, help='同时进行的翻译请求数')
+    parser.add_argument('--resume', action='store_true', help='继续该项目与分类下最近一个未完成的批次（忽略文件通配符）')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='只列出将要翻译的文件、分块数与预计 token 数')
+    parser.add_argument('--config', default=CONFIG_PATH, help=f'配置文件路径 (默认: {CONFIG_PATH})')
+    parser.add_argument('--save-config', action='store_true', help='把本次命令行中的设置写回配置文件')
+    parser.add_argument('--api-base', help='API 基础地址')
+    parser.add_argument('--api-key', help=f'API 密钥（也可使用环境变量 {API_KEY_ENV}）')
+    parser.add_argument('--model', help='模型名称')
+    parser.add_argument('--prompt-file', help='从文件读取提示词')
+    parser.add_argument('--rpm', type=int, help='每分钟请求数上限，0 表示不限')
+    parser.add_argument('--tpm', type=int, help='每分钟 token 数上限，0 表示不限')
+    parser.add_argument('--chunk-chars', type=int, help='翻译分块的目标字符数')
+    parser.add_argument('--timeout', type=int, help='读取超时（秒）')
+    parser.add_argument('--max-retries', type=int, help='最大重试次数')
+    parser.add_argument('--no-stream', action='store_true', help='不使用流式输出')
+    parser.add_argument('--no-tm', action='store_true', help='不使用翻译记忆')
+    parser.add_argument('--format', action='store_true', help='写入前用 format_fix 整理译文格式')
+    parser.add_argument('--no-validate', action='store_true', help='不检查译文结构')
+    parser.add_argument('--schedule', choices=SCHEDULES, help='翻译顺序：sjf 预计 token 少的先翻译，priority 按元信息 priority 字段，none 保持原顺序')
+    parser.add_argument('--price-input', type=float, help='输入每百万 token 的价格，用于估算费用')
+    parser.add_argument('--price-output', type=float, help='输出每百万 token 的价格')
+    add_metrics_arguments(parser)
+    # 允许通配符写在选项之后，如 translator.py PROJECT -c news '2025*.md'
+    args = parser.parse_intermixed_args()
+
+    setup_logging()
+    config = load_config(args.config)
+    overrides = {
+        'api_base': args.api_base,
+        'api_key': args.api_key,
+        'model': args.model,
+        'max_workers': args.workers,
+        'rpm': args.rpm,
+        'tpm': args.tpm,
+        'chunk_chars': args.chunk_chars,
+        'timeout': args.timeout,
+        'max_retries': args.max_retries,
+        'schedule': args.schedule,
+        'price_input': args.price_input,
+        'price_output': args.price_output,
+    }
+    if args.prompt_file:
+        with open(args.prompt_file, encoding='utf-8') as f:
+            overrides['prompt'] = f.read().strip()
+    if args.no_stream:
+        overrides['stream'] = False
+    if args.no_tm:
+        overrides['use_tm'] = False
+    if args.format:
+        overrides['format_output'] = True
+    if args.no_validate:
+        overrides['validate'] = False
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    try:
+        validate_config(config)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.save_config:
+        save_config(config, args.config)
+        logger.info(f"配置已保存到 {args.config}")
+
+    metrics = metrics_from_args(args)
+    translator = Translator(config, metrics=metrics)
+    try:
+        if args.resume:
+            _, failures = translator.resume_batch(args.project, args.category, args.dry_run)
+            return 1 if failures else 0
+
+        try:
+            files = list_sources(args.project, args.category, args.patterns)
+        except OSError as e:
+            logger.error(f"加载文件失败: {e}")
+            return 2
+        if not files:
+            logger.warning("没有匹配的文件")
+            return 0
+
+        _, failures = translator.translate_files(args.project, args.category, files, args.dry_run)
+        return 1 if failures else 0
+    finally:
+        metrics.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,102 @@
+import re
+from collections import Counter
+
+from md_chunker import split_front_matter
+
+TAG_RE = re.compile(r'\{%-?\s*(.*?)\s*-?%\}', re.S)
+# 标签中必须原样保留的参数：URL、路径、锚点以及 color:blue、youtube:ID 这类选项
+TAG_ARG_RE = re.compile(r'^(?:[a-z][\w+.-]*:\S|/|#)', re.I)
+FENCE_RE = re.compile(r'^[ \t]*(```|~~~).*?^[ \t]*\1[ \t]*$', re.M | re.S)
+FENCE_LINE_RE = re.compile(r'^[ \t]*(?:```|~~~)', re.M)
+HEADING_RE = re.compile(r'^[ \t]*#{1,6}[ \t]', re.M)
+LINK_RE = re.compile(r'\]\(\s*<?([^)\s>]+)')
+FRONT_MATTER_KEY_RE = re.compile(r'^([A-Za-z_][\w-]*):', re.M)
+MIN_LENGTH_RATIO = 0.15  # 译文与原文的最小长度比，中文译文通常比英文原文短，低于该值视为被截断
+
+
+def tag_signature(tag):
+    """
+    标签的结构部分：名称与不应被翻译的参数。
+
+    说明文字（如图片描述、按钮文字）允许翻译，其中可能含有未转义的引号，
+    因此不按引号解析，只保留 URL、路径与选项类的参数。
+    """
+    words = tag.split()
+    if not words:
+        return ('',)
+    args = (word.strip('\'"') for word in words[1:])
+    return (words[0],) + tuple(arg for arg in args if TAG_ARG_RE.match(arg))
+
+
+def _compare(label, source_items, translated_items):
+    """比较两组元素（按出现次数），返回描述差异的列表。"""
+    source_count = Counter(source_items)
+    translated_count = Counter(translated_items)
+    if source_count == translated_count:
+        return []
+    missing = list((source_count - translated_count).elements())
+    extra = list((translated_count - source_count).elements())
+    detail = []
+    if missing:
+        detail.append(f"缺少 {missing[:3]}")
+    if extra:
+        detail.append(f"多出 {extra[:3]}")
+    return [f"{label}不一致（原文 {sum(source_count.values())} 个，译文 {sum(translated_count.values())} 个，"
+            f"{'，'.join(detail)}）"]
+
+
+def validate_chunk(source, translated):
+    """
+    检查一个分块的译文是否保留了原文的结构。
+
+    依次比较围栏代码块（逐字节，模型常把整段译文包在 ```markdown 中）、{% %} 标签的名称与参数、
+    标题数、链接目标，并检查译文是否明显过短（被截断）。通过本检查的各分块拼接后，
+    正文也能通过 validate_file 的检查。只用正则扫描两段文本，耗时可以忽略。
+
+    参数:
+    source (str): 分块原文。
+    translated (str): 模型译文。
+
+    返回:
+    list: 问题描述，为空表示通过。
+    """
+    problems = []
+    source_code = [m.group() for m in FENCE_RE.finditer(source)]
+    translated_code = [m.group() for m in FENCE_RE.finditer(translated)]
+    source_fences = len(FENCE_LINE_RE.findall(source))
+    translated_fences = len(FENCE_LINE_RE.findall(translated))
+    if source_code != translated_code:
+        problems.append(f"代码块被修改（原文 {len(source_code)} 个，译文 {len(translated_code)} 个）")
+    elif source_fences != translated_fences:
+        # 未闭合的围栏不会被 FENCE_RE 匹配
+        problems.append(f"围栏行数不一致（原文 {source_fences} 行，译文 {translated_fences} 行）")
+    problems += _compare("标签", [tag_signature(t) for t in TAG_RE.findall(source)],
+                         [tag_signature(t) for t in TAG_RE.findall(translated)])
+    source_headings = len(HEADING_RE.findall(source))
+    translated_headings = len(HEADING_RE.findall(translated))
+    if source_headings != translated_headings:
+        problems.append(f"标题数不一致（原文 {source_headings} 个，译文 {translated_headings} 个）")
+    problems += _compare("链接目标", LINK_RE.findall(source), LINK_RE.findall(translated))
+    if len(translated.strip()) < len(source.strip()) * MIN_LENGTH_RATIO:
+        problems.append(f"译文过短（{len(translated.strip())}/{len(source.strip())} 个字符），可能被截断")
+    return problems
+
+
+def validate_file(source, translated):
+    """
+    检查整篇译文：元信息的键与围栏代码块（逐字节）必须与原文一致，再按 validate_chunk 检查正文。
+
+    返回:
+    list: 问题描述，为空表示通过。
+    """
+    source_front, source_body = split_front_matter(source)
+    translated_front, translated_body = split_front_matter(translated)
+    problems = []
+    problems += _compare("元信息字段", FRONT_MATTER_KEY_RE.findall(source_front),
+                         FRONT_MATTER_KEY_RE.findall(translated_front))
+    source_code = [m.group() for m in FENCE_RE.finditer(source_body)]
+    translated_code = [m.group() for m in FENCE_RE.finditer(translated_body)]
+    if source_code != translated_code:
+        problems.append(f"代码块被修改（原文 {len(source_code)} 个，译文 {len(translated_code)} 个）")
+    problems += validate_chunk(FENCE_RE.sub('', source_body), FENCE_RE.sub('', translated_body))
+    return problems
\ No newline at end of file